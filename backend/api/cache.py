@@ -0,0 +1,128 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+cache_stats = Counter()
+
+
+def is_shared():
+    """Видят ли версии пространств все процессы. Кеш в памяти процесса
+    у каждого воркера свой: сброс из команды или другого воркера
+    до остальных не доходит."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def version_key(namespace):
+    return f'api:{namespace}:version'
+
+
+def get_version(namespace):
+    """Версия пространства. Ключ версии кеш может вытеснить, поэтому
+    новая версия начинается не с 1, а с текущего времени в наносекундах:
+    иначе после вытеснения снова стали бы видны ответы старых версий."""
+    return cache.get_or_set(version_key(namespace), time.time_ns, timeout=None)
+
+
+def invalidate(namespace):
+    """Делает недействительными все закешированные ответы пространства."""
+    try:
+        cache.incr(version_key(namespace))
+    except ValueError:
+        cache.set(version_key(namespace), time.time_ns(), timeout=None)
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return any(
+        value.strip() in (etag, '*') for value in header.split(',')
+    )
+
+
+def user_etag(request, *parts):
+    """Слабый ETag ответа, зависящего от пользователя: учитывает запрос,
+    версию взаимодействий пользователя, версии тегов и ингредиентов
+    и переданные отметки данных."""
+    user = request.user
+    version = None if user.is_anonymous else (
+        user.id, user.interactions_version
+    )
+    stamp = repr((
+        request.path,
+        sorted(request.query_params.lists()),
+        request.accepted_renderer.format,
+        version,
+        get_version('tags'),
+        get_version('ingredients'),
+        parts,
+    ))
+    return f'W/"{hashlib.sha1(stamp.encode()).hexdigest()}"'
+
+
+def conditional_response(request, etag, get_response):
+    """Отвечает 304 без вызова get_response, если ETag совпал."""
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = get_response()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class CachedResponseMixin:
+    """Кеширует готовый JSON ответов list и retrieve для каждого набора
+    параметров запроса и отвечает 304 на совпадающий If-None-Match.
+    Сброс — через invalidate(cache_namespace)."""
+
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return handler(request, *args, **kwargs)
+        query = sorted(request.query_params.lists())
+        digest = hashlib.sha1(
+            f'{request.path}?{query}'.encode()
+        ).hexdigest()
+        key = (
+            f'api:{self.cache_namespace}:'
+            f'{get_version(self.cache_namespace)}:{digest}'
+        )
+        entry = cache.get(key)
+        if entry is None:
+            cache_stats[self.cache_namespace, 'miss'] += 1
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = request.accepted_renderer.render(
+                response.data, renderer_context=self.get_renderer_context()
+            )
+            entry = (f'"{hashlib.sha1(content).hexdigest()}"', content)
+            cache.set(key, entry, timeout=settings.API_CACHE_TIMEOUT)
+            status = 'MISS'
+        else:
+            cache_stats[self.cache_namespace, 'hit'] += 1
+            status = 'HIT'
+        etag, content = entry
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        response['X-Cache'] = status
+        return response
@@ -0,0 +1,17 @@
+from django.core.checks import Warning, register
+
+from .cache import is_shared
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    if is_shared():
+        return []
+    return [Warning(
+        'Кеш ответов API хранится в памяти процесса.',
+        hint=(
+            'Сброс кеша тегов и ингредиентов не дойдёт до других воркеров '
+            'и команд управления. Укажите общий кеш в CACHE_BACKEND.'
+        ),
+        id='api.W001',
+    )]
@@ -0,0 +1,160 @@
+import binascii
+import uuid
+from base64 import b64decode
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile, TemporaryUploadedFile
+)
+from PIL import Image, UnidentifiedImageError
+from rest_framework.relations import (
+    MANY_RELATION_KWARGS, ManyRelatedField, PrimaryKeyRelatedField
+)
+from rest_framework.serializers import ImageField
+
+HEADER_LIMIT = 1 << 20
+
+
+class StreamingBase64ImageField(ImageField):
+    """Картинка в base64, декодируемая по частям.
+
+    Размер проверяется по длине строки до декодирования, формат и размеры —
+    по заголовку картинки, как только он декодирован. Большие картинки
+    пишутся во временный файл, а не держатся в памяти целиком.
+    Строка должна быть без переносов.
+    """
+
+    default_error_messages = {
+        'invalid_base64': 'Загрузите картинку в виде строки base64.',
+        'too_large': 'Картинка больше {max_size} байт.',
+        'invalid_format': 'Допустимые форматы картинки: {formats}.',
+        'too_many_pixels': 'Картинка больше {max_pixels} пикселей.',
+    }
+    FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+    chunk_size = 1 << 16
+
+    def __init__(self, max_size=None, max_pixels=None, **kwargs):
+        self.max_size = max_size or settings.RECIPE_IMAGE_MAX_SIZE
+        self.max_pixels = max_pixels or settings.RECIPE_IMAGE_MAX_PIXELS
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid_base64')
+        payload = data.rpartition(';base64,')[2]
+        size = len(payload) * 3 // 4 - payload[-2:].count('=')
+        if size > self.max_size:
+            self.fail('too_large', max_size=self.max_size)
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            upload = TemporaryUploadedFile('upload', None, 0, None)
+        else:
+            upload = InMemoryUploadedFile(
+                BytesIO(), None, 'upload', None, 0, None
+            )
+        try:
+            self.decode(payload, upload)
+        except Exception:
+            upload.close()
+            raise
+        upload.seek(0)
+        return super().to_internal_value(upload)
+
+    def decode(self, payload, upload):
+        image_format = None
+        for start in range(0, len(payload), self.chunk_size):
+            try:
+                chunk = b64decode(
+                    payload[start:start + self.chunk_size], validate=True
+                )
+            except (binascii.Error, ValueError):
+                self.fail('invalid_base64')
+            upload.write(chunk)
+            upload.size += len(chunk)
+            if image_format is None and upload.size <= HEADER_LIMIT:
+                image_format = self.check_header(upload)
+        if image_format is None:
+            image_format = self.check_header(upload)
+        if image_format is None:
+            self.fail('invalid_image')
+        upload.name = f'{uuid.uuid4()}.{self.FORMATS[image_format]}'
+        upload.content_type = Image.MIME[image_format]
+
+    def check_header(self, upload):
+        """Возвращает формат картинки или None, если заголовок
+        ещё не декодирован целиком."""
+        upload.seek(0)
+        try:
+            with Image.open(upload.file) as image:
+                image_format, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels', max_pixels=self.max_pixels)
+        except (UnidentifiedImageError, OSError):
+            return None
+        finally:
+            upload.seek(0, 2)
+        if image_format not in self.FORMATS:
+            self.fail('invalid_format', formats=', '.join(self.FORMATS))
+        if width * height > self.max_pixels:
+            self.fail('too_many_pixels', max_pixels=self.max_pixels)
+        return image_format
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    """Список первичных ключей, загружаемый одним запросом in_bulk.
+    Сообщает сразу обо всех несуществующих id. Длина списка max_length
+    проверяется до запроса."""
+
+    default_error_messages = {
+        'does_not_exist': 'Объекты с id {pk_values} не существуют.',
+        'max_length': 'Не больше {max_length} элементов.',
+    }
+
+    def __init__(self, *args, max_length=None, **kwargs):
+        self.max_length = max_length
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        if self.max_length is not None and len(data) > self.max_length:
+            self.fail('max_length', max_length=self.max_length)
+        return self.resolve(data)
+
+    def resolve(self, data):
+        queryset = self.child_relation.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for pk in data:
+            try:
+                pks.append(pk_field.to_python(pk))
+            except DjangoValidationError:
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(pk).__name__
+                )
+        objects = queryset.in_bulk(set(pks))
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            self.fail(
+                'does_not_exist', pk_values=', '.join(map(str, missing))
+            )
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который с many=True
+    не делает отдельный запрос на каждый элемент."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {
+            'max_length': kwargs.pop('max_length', None),
+            'child_relation': cls(*args, **kwargs),
+        }
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
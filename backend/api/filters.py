@@ -1,15 +1,53 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+)
+from django.db import connection
+from django.db.models import (
+    BooleanField, Case, F, OuterRef, Q, Subquery, Sum, Value, When
+)
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe, RecipeSearchToken, Tag
+from recipes.search import tokenize
+from .search import ingredient_index
 
 
 class IngredientFilter(FilterSet):
     name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
+    search = filters.CharFilter(method='filter_search')
+    fuzzy = filters.CharFilter(method='filter_fuzzy')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def filter_search(self, queryset, name, value):
+        ids = ingredient_index.search(
+            value, limit=settings.INGREDIENT_SEARCH_LIMIT
+        )
+        if not ids:
+            return queryset.none()
+        return queryset.filter(id__in=ids).order_by(Case(*(
+            When(id=pk, then=Value(position))
+            for position, pk in enumerate(ids)
+        )))
+
+    def filter_fuzzy(self, queryset, name, value):
+        if connection.vendor != 'postgresql':
+            return self.filter_search(queryset, name, value)
+        return queryset.annotate(
+            is_prefix=Case(
+                When(name__istartswith=value, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            ),
+            similarity=TrigramSimilarity('name', value)
+        ).filter(
+            Q(is_prefix=True)
+            | Q(similarity__gt=settings.INGREDIENT_TRIGRAM_THRESHOLD)
+        ).order_by('-is_prefix', '-similarity', 'name')
+
 
 class RecipeFilter(FilterSet):
     author = filters.NumberFilter(
@@ -25,6 +63,11 @@ class RecipeFilter(FilterSet):
         to_field_name='slug',
         queryset=Tag.objects.all()
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'popular'),),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -33,9 +76,39 @@ class RecipeFilter(FilterSet):
     def filter_is_favorited(self, queryset, name, value):
         if not value:
             return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
         return queryset.filter(favourites__user=self.request.user)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if not value:
-            queryset
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
         return queryset.filter(purchases__user=self.request.user)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by('-favorites_count', '-id')
+
+    def filter_search(self, queryset, name, value):
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                value, config='russian', search_type='websearch'
+            )
+            return queryset.annotate(
+                search_vector=SearchVector(
+                    'search_document', config='russian'
+                )
+            ).filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            ).order_by('-rank', '-id')
+        tokens = set(tokenize(value))
+        if not tokens:
+            return queryset.none()
+        matches = RecipeSearchToken.objects.filter(token__in=tokens)
+        rank = matches.filter(recipe=OuterRef('pk')).values(
+            'recipe'
+        ).annotate(rank=Sum('weight')).values('rank')
+        return queryset.filter(
+            id__in=matches.values('recipe')
+        ).annotate(rank=Subquery(rank)).order_by('-rank', '-id')
@@ -0,0 +1,145 @@
+import json
+import platform
+import time
+import tracemalloc
+from statistics import median, quantiles
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipe, User
+
+ENDPOINTS = (
+    ('recipes', '/api/recipes/?recipes_limit=6', False),
+    ('recipes_page_50', '/api/recipes/?recipes_limit=50', False),
+    ('recipes_auth', '/api/recipes/?recipes_limit=6', True),
+    ('recipes_favorited',
+     '/api/recipes/?is_favorited=1&recipes_limit=6', True),
+    ('recipes_popular',
+     '/api/recipes/?ordering=popular&recipes_limit=6', False),
+    ('feed', '/api/recipes/feed/?recipes_limit=6', True),
+    ('similar', '/api/recipes/{recipe}/similar/?recipes_limit=6', False),
+    ('recommended', '/api/recipes/recommended/?recipes_limit=6', True),
+    ('recipe_detail', '/api/recipes/{recipe}/', True),
+    ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True),
+    ('download_shopping_cart',
+     '/api/recipes/download_shopping_cart/?format=txt', True),
+    ('ingredients_search', '/api/ingredients/?name=сол', False),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет основные эндпоинты API через тестовый клиент Django: '
+        'p50/p95 времени ответа, число SQL-запросов и пик памяти. '
+        'Результат пишется в JSON и сравнивается с сохранённым базовым.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого идут запросы; '
+                 'по умолчанию — с наибольшим числом подписок'
+        )
+        parser.add_argument('--output', help='Куда записать результаты')
+        parser.add_argument(
+            '--baseline', help='JSON предыдущего запуска для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        if recipe is None:
+            raise CommandError('Нет рецептов: запустите generate_dataset')
+        token, _ = Token.objects.get_or_create(user=user)
+        clients = (
+            Client(), Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        )
+        results = {
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'recipes': Recipe.objects.count(),
+                'users': User.objects.count(),
+            },
+            'endpoints': {},
+        }
+        for name, url, authenticated in ENDPOINTS:
+            results['endpoints'][name] = self.measure(
+                clients[authenticated], url.format(recipe=recipe.id), options
+            )
+            self.stdout.write(self.format_line(
+                name, results['endpoints'][name]
+            ))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as stream:
+                self.compare(json.load(stream), results)
+
+    @staticmethod
+    def get_user(email):
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            user = User.objects.annotate(
+                subscriptions=Count('followers')
+            ).order_by('-subscriptions', 'id').first()
+        if user is None:
+            raise CommandError('Пользователь не найден')
+        return user
+
+    @staticmethod
+    def measure(client, url, options):
+        for _ in range(options['warmup']):
+            b''.join(client.get(url))
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            response = client.get(url)
+            b''.join(response)
+            timings.append(time.perf_counter() - started)
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            b''.join(client.get(url))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        p95 = quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(median(timings) * 1e3, 3),
+            'p95_ms': round(p95 * 1e3, 3),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def format_line(name, result):
+        return (
+            f'{name:<24} {result["status"]} '
+            f'p50={result["p50_ms"]:.1f}мс p95={result["p95_ms"]:.1f}мс '
+            f'запросов={result["queries"]} '
+            f'память={result["peak_memory_kb"]:.0f}КБ'
+        )
+
+    def compare(self, baseline, results):
+        self.stdout.write('\nСравнение с базовым запуском:')
+        for name, result in results['endpoints'].items():
+            before = baseline['endpoints'].get(name)
+            if before is None:
+                continue
+            change = (result['p50_ms'] / before['p50_ms'] - 1) * 100
+            self.stdout.write(
+                f'{name:<24} p50 {change:+.0f}% '
+                f'запросов {before["queries"]} → {result["queries"]} '
+                f'память {before["peak_memory_kb"]:.0f} → '
+                f'{result["peak_memory_kb"]:.0f}КБ'
+            )
@@ -0,0 +1,129 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+
+from api.fields import StreamingBase64ImageField
+
+FIELDS = {
+    'Base64ImageField': lambda payload, side: Base64ImageField(),
+    'StreamingBase64ImageField': lambda payload, side: (
+        StreamingBase64ImageField(max_size=len(payload), max_pixels=side ** 2)
+    ),
+}
+
+
+def memory(name):
+    """Значение VmRSS (текущий RSS) или VmHWM (пиковый) процесса в байтах."""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(f'{name}:'):
+                return int(line.split()[1]) * 1024
+    raise CommandError(f'В /proc/self/status нет {name}')
+
+
+def reset_peak_rss():
+    """Сбрасывает пиковый RSS процесса до текущего (Linux 4.0+): пик
+    запуска Django иначе скрыл бы память, занятую декодированием."""
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пиковый RSS и время декодирования картинки в base64: '
+        'Base64ImageField против StreamingBase64ImageField. Каждое '
+        'измерение идёт в отдельном свежем процессе; нужен Linux.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--side', type=int, default=2500,
+            help='Сторона квадратной картинки из шума в пикселях'
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--measure', choices=sorted(FIELDS),
+            help='Служебный: одно измерение поля в этом процессе'
+        )
+        parser.add_argument(
+            '--payload', help='Служебный: файл со строкой base64'
+        )
+
+    @staticmethod
+    def payload(side):
+        buffer = BytesIO()
+        Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(
+            buffer, 'JPEG', quality=95
+        )
+        return 'data:image/jpeg;base64,' + base64.b64encode(
+            buffer.getvalue()
+        ).decode()
+
+    def measure(self, name, path, side):
+        """Декодирует картинку полем name и печатает JSON с приростом
+        пикового RSS и временем. Вызывается в дочернем процессе."""
+        with open(path, encoding='ascii') as file:
+            payload = file.read()
+        field = FIELDS[name](payload, side)
+        reset_peak_rss()
+        baseline = memory('VmRSS')
+        started = time.perf_counter()
+        upload = field.to_internal_value(payload)
+        elapsed = time.perf_counter() - started
+        growth = memory('VmHWM') - baseline
+        upload.close()
+        self.stdout.write(json.dumps({'rss': growth, 'time': elapsed}))
+
+    @staticmethod
+    def run_child(name, path, side):
+        result = subprocess.run(
+            [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'),
+                'bench_image_upload', '--measure', name, '--payload', path,
+                '--side', str(side),
+            ],
+            capture_output=True, text=True
+        )
+        if result.returncode:
+            raise CommandError(
+                f'Измерение {name} завершилось с ошибкой:\n{result.stderr}'
+            )
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        side = options['side']
+        if options['measure']:
+            self.measure(options['measure'], options['payload'], side)
+            return
+        payload = self.payload(side)
+        self.stdout.write(
+            f'Строка base64: {len(payload) / 2 ** 20:.1f} МБ, '
+            f'картинка: {len(payload) * 3 / 4 / 2 ** 20:.1f} МБ'
+        )
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.b64', encoding='ascii'
+        ) as file:
+            file.write(payload)
+            file.flush()
+            del payload
+            for name in FIELDS:
+                runs = [
+                    self.run_child(name, file.name, side)
+                    for _ in range(options['repeat'])
+                ]
+                rss = sorted(run['rss'] for run in runs)[len(runs) // 2]
+                elapsed = min(run['time'] for run in runs)
+                self.stdout.write(
+                    f'{name}: прирост пикового RSS {rss / 2 ** 20:.1f} МБ, '
+                    f'время {elapsed * 1e3:.0f} мс'
+                )
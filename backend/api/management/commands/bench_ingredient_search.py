@@ -0,0 +1,61 @@
+import random
+import time
+from statistics import median, quantiles
+
+from django.core.management.base import BaseCommand
+
+from api.search import ingredient_index
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет задержку поиска ингредиентов на каждое нажатие клавиши: '
+        'индекс в памяти против фильтра name__istartswith.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--words', type=int, default=200,
+            help='Сколько случайных названий «набрать» посимвольно'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    @staticmethod
+    def report(timings):
+        p95 = quantiles(timings, n=20)[-1]
+        return (
+            f'p50={median(timings) * 1e6:.0f}мкс '
+            f'p95={p95 * 1e6:.0f}мкс n={len(timings)}'
+        )
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('Нет ингредиентов: загрузите data/')
+            return
+        random.seed(options['seed'])
+        keystrokes = [
+            name[:length]
+            for name in random.choices(names, k=options['words'])
+            for length in range(1, len(name) + 1)
+        ]
+        started = time.perf_counter()
+        ingredient_index.invalidate()
+        ingredient_index.search('а')
+        self.stdout.write(
+            f'Построение индекса: '
+            f'{(time.perf_counter() - started) * 1e3:.1f}мс'
+        )
+        index_timings, db_timings = [], []
+        for query in keystrokes:
+            started = time.perf_counter()
+            ingredient_index.search(query, limit=50)
+            index_timings.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            list(Ingredient.objects.filter(
+                name__istartswith=query
+            ).values_list('id', flat=True))
+            db_timings.append(time.perf_counter() - started)
+        self.stdout.write(f'Индекс:        {self.report(index_timings)}')
+        self.stdout.write(f'istartswith:   {self.report(db_timings)}')
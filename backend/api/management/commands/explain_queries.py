@@ -0,0 +1,136 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef
+
+from recipes.models import (
+    Favorite, FeedEntry, Ingredient, Recipe, ShoppingCart, Tag, User
+)
+from users.models import Subscribe
+
+PAGE = 6
+# Таблицы, которые растут с числом пользователей и рецептов:
+# полный проход по ним в запросе API — регрессия индексов.
+LARGE_TABLES = {
+    'recipes_recipe', 'recipes_recipe_tags', 'recipes_favorite',
+    'recipes_shoppingcart', 'recipes_ingredient',
+    'recipes_ingredientinrecipe', 'recipes_feedentry', 'users_subscribe',
+    'users_customuser',
+}
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+def canonical_queries(user, author, tag, prefix):
+    """(название, queryset) — запросы основных эндпоинтов API."""
+    recipes = Recipe.objects.order_by('-id')
+    yield 'recipes', recipes[:PAGE]
+    yield 'recipes_popular', recipes.order_by(
+        '-favorites_count', '-id'
+    )[:PAGE]
+    yield 'recipes_author', recipes.filter(author=author)[:PAGE]
+    yield 'recipes_tag', recipes.filter(tags=tag)[:PAGE]
+    yield 'recipes_favorited', recipes.filter(favourites__user=user)[:PAGE]
+    yield 'recipes_in_shopping_cart', recipes.filter(
+        purchases__user=user
+    )[:PAGE]
+    yield 'recipes_flags', recipes.annotate(
+        is_favorited=Exists(Favorite.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )),
+        is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )),
+        author_is_subscribed=Exists(Subscribe.objects.filter(
+            user=user, author=OuterRef('author')
+        ))
+    )[:PAGE]
+    yield 'feed', FeedEntry.objects.filter(user=user).order_by(
+        '-recipe_id'
+    ).values_list('recipe_id', flat=True)[:PAGE]
+    yield 'feed_pulled_author', recipes.filter(
+        author=author
+    ).values_list('id', flat=True)[:PAGE]
+    yield 'subscriptions', User.objects.filter(
+        followings__user=user
+    ).order_by('-id')[:PAGE]
+    yield 'followers', Subscribe.objects.filter(
+        author=author
+    ).values_list('user_id', flat=True)
+    yield 'ingredients_prefix', Ingredient.objects.filter(
+        name__istartswith=prefix
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN ANALYZE основных запросов API на текущей базе '
+        'PostgreSQL и завершается с ошибкой при полных проходах по большим '
+        'таблицам. Запускать на данных generate_dataset или больше: '
+        'на маленьких таблицах планировщик может честно предпочесть '
+        'полный проход. На других базах только печатает время и планы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', help='Только запросы с этой подстрокой в названии'
+        )
+        parser.add_argument(
+            '--plans', action='store_true', help='Печатать планы целиком'
+        )
+
+    def handle(self, *args, **options):
+        analyze = connection.vendor == 'postgresql'
+        if analyze:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{connection.vendor}: EXPLAIN без ANALYZE, '
+                'планы не проверяются'
+            ))
+        regressions = []
+        for name, queryset in canonical_queries(*self.sample()):
+            if options['only'] and options['only'] not in name:
+                continue
+            plan, elapsed = self.explain(queryset, analyze)
+            scans = sorted(set(SEQ_SCAN.findall(plan)) & LARGE_TABLES)
+            self.stdout.write(
+                f'{name:<26} {elapsed:8.2f} мс  '
+                + (f'полный проход: {", ".join(scans)}' if scans else 'ok')
+            )
+            if options['plans']:
+                self.stdout.write(plan + '\n')
+            if scans:
+                regressions.append(name)
+        if regressions:
+            raise CommandError(
+                f'Полный проход по большим таблицам: {", ".join(regressions)}'
+            )
+
+    @staticmethod
+    def sample():
+        """Пользователь с наибольшим числом подписок, автор с наибольшим
+        числом рецептов, тег и начало названия ингредиента."""
+        user = User.objects.annotate(
+            subscriptions=Count('followers')
+        ).order_by('-subscriptions', 'id').first()
+        author = User.objects.order_by('-recipes_count', 'id').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        if None in (user, author, tag, ingredient):
+            raise CommandError('База пуста: запустите generate_dataset')
+        return user, author, tag, ingredient.name[:3]
+
+    @staticmethod
+    def explain(queryset, analyze):
+        """План запроса и время выполнения в миллисекундах."""
+        if analyze:
+            plan = queryset.explain(analyze=True, buffers=True)
+            return plan, float(EXECUTION_TIME.search(plan).group(1))
+        plan = queryset.explain()
+        started = time.perf_counter()
+        list(queryset)
+        return plan, (time.perf_counter() - started) * 1e3
@@ -0,0 +1,161 @@
+"""Метрики запросов к API в памяти процесса и их выгрузка
+в текстовом формате Prometheus. Каждый процесс gunicorn считает своё."""
+import re
+from bisect import bisect_left
+from collections import Counter
+from threading import Lock
+
+from django.conf import settings
+
+from .cache import cache_stats
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+HISTOGRAMS = (
+    ('request_duration_seconds', 'duration', 'Время ответа'),
+    ('db_queries', 'queries', 'Число SQL-запросов на ответ'),
+)
+COUNTERS = (
+    ('db_duration_seconds_total', 'sql_time', 'Время SQL-запросов'),
+    ('response_bytes_total', 'response_bytes', 'Размер ответов'),
+)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\"s\d+_x\d+\"|%s|\b\d+(?:\.\d+)?\b")
+LISTS = re.compile(r'\((?:\s*\?\s*,)*\s*\?\s*\)')
+ROWS = re.compile(r'\(\.\.\.\)(?:,\s*\(\.\.\.\))+')
+
+
+def fingerprint(sql):
+    """SQL без значений: запросы, отличающиеся только параметрами,
+    получают одинаковый отпечаток."""
+    return ROWS.sub('(...)', LISTS.sub('(...)', LITERALS.sub('?', sql)))
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_time = 0
+        self.response_bytes = 0
+        self.duplicates = Counter()
+
+
+class Registry:
+    """Статистика по (представление, метод). Число рядов ограничено
+    числом маршрутов, отпечатков повторов — METRICS_MAX_FINGERPRINTS
+    на маршрут."""
+
+    def __init__(self):
+        self.endpoints = {}
+        self.lock = Lock()
+
+    def record(self, key, duration, queries, response_bytes):
+        """queries — список пар (sql, время выполнения)."""
+        repeated = [
+            sql for sql, count in Counter(
+                fingerprint(sql) for sql, _ in queries
+            ).items() if count > 1
+        ]
+        with self.lock:
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = EndpointStats()
+            stats.duration.observe(duration)
+            stats.queries.observe(len(queries))
+            stats.sql_time += sum(elapsed for _, elapsed in queries)
+            stats.response_bytes += response_bytes
+            for sql in repeated:
+                if (
+                    sql in stats.duplicates
+                    or len(stats.duplicates)
+                    < settings.METRICS_MAX_FINGERPRINTS
+                ):
+                    stats.duplicates[sql] += 1
+
+    def render(self):
+        with self.lock:
+            lines = list(self.render_endpoints())
+        lines.extend(render_cache_stats())
+        return '\n'.join(lines) + '\n'
+
+    def render_endpoints(self):
+        endpoints = [
+            (f'view="{view}",method="{method}"', stats)
+            for (view, method), stats in sorted(self.endpoints.items())
+        ]
+        for name, attribute, help_text in HISTOGRAMS:
+            yield from header(name, 'histogram', help_text)
+            for labels, stats in endpoints:
+                yield from render_histogram(
+                    name, labels, getattr(stats, attribute)
+                )
+        for name, attribute, help_text in COUNTERS:
+            yield from header(name, 'counter', help_text)
+            for labels, stats in endpoints:
+                value = getattr(stats, attribute)
+                yield f'foodgram_{name}{{{labels}}} {value}'
+        yield from header(
+            'duplicate_queries_total', 'counter',
+            'Ответы, в которых SQL-запрос повторялся'
+        )
+        for labels, stats in endpoints:
+            for sql, count in stats.duplicates.most_common():
+                yield (
+                    f'foodgram_duplicate_queries_total{{{labels},'
+                    f'query="{escape(sql)}"}} {count}'
+                )
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+def header(name, kind, help_text):
+    yield f'# HELP foodgram_{name} {help_text}'
+    yield f'# TYPE foodgram_{name} {kind}'
+
+
+def render_histogram(name, labels, histogram):
+    for bound, count in histogram.cumulative():
+        yield f'foodgram_{name}_bucket{{{labels},le="{bound}"}} {count}'
+    yield f'foodgram_{name}_sum{{{labels}}} {histogram.sum}'
+    yield f'foodgram_{name}_count{{{labels}}} {sum(histogram.counts)}'
+
+
+def escape(value):
+    return value[:settings.METRICS_MAX_QUERY_LENGTH].replace(
+        '\\', '\\\\'
+    ).replace('"', '\\"').replace('\n', ' ')
+
+
+def render_cache_stats():
+    yield '# HELP foodgram_cache_requests_total Обращения к кешу ответов'
+    yield '# TYPE foodgram_cache_requests_total counter'
+    for (namespace, result), count in sorted(cache_stats.items()):
+        yield (
+            'foodgram_cache_requests_total'
+            f'{{namespace="{namespace}",result="{result}"}} {count}'
+        )
+
+
+registry = Registry()
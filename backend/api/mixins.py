@@ -1,19 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.serializers import ModelSerializer
 from rest_framework.status import (
-    HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST
+    HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST
 )
 from rest_framework.viewsets import ModelViewSet
 
 from recipes.models import IngredientInRecipe, Recipe
 from users.models import Subscribe
 
+User = get_user_model()
+
 
 class CreateDestroy(ModelViewSet):
     """Вьюсет, содержащий методы для создания и удаления экземпляров класса."""
 
+    @staticmethod
+    def _lock_user(user):
+        """Блокирует строку пользователя до конца транзакции запроса.
+        Изменения его избранного и корзины идут по очереди: прочитанные
+        до записи строки не устаревают, и изменения счётчиков и списка
+        покупок не применяются дважды."""
+        list(User.objects.select_for_update().filter(
+            id=user.id
+        ).values_list('id', flat=True))
+
     def _post_method_for_actions(self, request, pk, serializers):
+        self._lock_user(request.user)
         data = {'user': request.user.id, 'recipe': pk}
         serializer = serializers(data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
@@ -22,6 +37,7 @@ class CreateDestroy(ModelViewSet):
 
     def _delete_method_for_actions(self, request, pk, model):
         user = request.user
+        self._lock_user(user)
         recipe = get_object_or_404(Recipe, id=pk)
         model_obj = model.objects.filter(user=user, recipe=recipe)
         if model_obj.exists():
@@ -30,12 +46,46 @@ class CreateDestroy(ModelViewSet):
         return Response(
             {'error': 'Этого рецепта нет у вас'}, status=HTTP_400_BAD_REQUEST)
 
+    def _batch_method_for_actions(self, request, serializers, model):
+        serializer = serializers(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        user = request.user
+        self._lock_user(user)
+        found = set(
+            Recipe.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        linked = set(model.objects.filter(
+            user=user, recipe_id__in=found
+        ).values_list('recipe_id', flat=True))
+        if request.method == 'POST':
+            changed = found - linked
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=pk) for pk in changed]
+            )
+            done, skipped = 'created', 'exists'
+        else:
+            changed = linked
+            if changed:
+                model.objects.filter(user=user, recipe_id__in=changed).delete()
+            done, skipped = 'deleted', 'absent'
+        results = []
+        for pk in ids:
+            if pk not in found:
+                status = 'not_found'
+            else:
+                status = done if pk in changed else skipped
+            results.append({'id': pk, 'status': status})
+        return Response(results, status=HTTP_200_OK)
+
 
 class IsSubscribed:
     """Класс добавляющий в сериализатор дополнительное поле,
     отображающее наличие подписки на автора."""
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -44,13 +94,45 @@ class IsSubscribed:
         ).exists()
 
 
+class ImageSrcset:
+    """Класс добавляющий в сериализатор поле с уменьшенными копиями
+    картинки в формате srcset: {формат: "url 320w, url 640w"}.
+    Пока картинка обрабатывается, поле пустое."""
+
+    def get_image_srcset(self, obj):
+        request = self.context.get('request')
+        srcset = {}
+        for extension, sizes in obj.image_variants.items():
+            urls = []
+            for width, name in sorted(
+                sizes.items(), key=lambda item: int(item[0])
+            ):
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls.append(f'{url} {width}w')
+            srcset[extension] = ', '.join(urls)
+        return srcset
+
+
+def set_prefetched(instance, name, objects):
+    """Кладёт уже известные связанные объекты в кеш prefetch_related,
+    чтобы instance.<name>.all() не обращался к базе."""
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+
 class CreatePopItems:
     """Вспомогательный класс для сериализатора.
     Задаёт методы создания и изменения рецептов."""
 
     @staticmethod
     def create_ingredients(recipe, ingredients):
-        IngredientInRecipe.objects.bulk_create([
+        return IngredientInRecipe.objects.bulk_create([
             IngredientInRecipe(
                 recipe=recipe,
                 ingredient=ingredient['id'],
@@ -58,9 +140,40 @@ class CreatePopItems:
             ) for ingredient in ingredients])
 
     @staticmethod
-    def create_tags(recipe, tags):
-        for tag in tags:
-            recipe.tags.add(tag)
+    def update_ingredients(recipe, ingredients):
+        """Приводит ингредиенты рецепта к новому списку: одна вставка,
+        одно обновление количеств и одно удаление.
+        Возвращает строки рецепта после изменения
+        и {id ингредиента: изменение количества}."""
+        current = {
+            item.ingredient_id: item
+            for item in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        changes, items, to_create, to_update = {}, [], [], []
+        for ingredient in ingredients:
+            amount = ingredient['amount']
+            item = current.pop(ingredient['id'].id, None)
+            if item is None:
+                item = IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient['id'], amount=amount
+                )
+                to_create.append(item)
+                changes[ingredient['id'].id] = amount
+            elif item.amount != amount:
+                changes[item.ingredient_id] = amount - item.amount
+                item.amount = amount
+                to_update.append(item)
+            item.ingredient = ingredient['id']
+            items.append(item)
+        IngredientInRecipe.objects.bulk_create(to_create)
+        IngredientInRecipe.objects.bulk_update(to_update, ['amount'])
+        if current:
+            IngredientInRecipe.objects.filter(
+                id__in=[item.id for item in current.values()]
+            ).delete()
+        for ingredient_id, item in current.items():
+            changes[ingredient_id] = -item.amount
+        return items, changes
 
     @staticmethod
     def pop_items(validated_data):
@@ -77,6 +190,8 @@ class RepresentationMixin(ModelSerializer):
                                   SubscriptionsSerializer)
         context = {'request': self.context.get('request')}
         if isinstance(instance, Subscribe):
+            # Подписка только что создана, проверять её наличие незачем.
+            instance.author.is_subscribed = True
             return SubscriptionsSerializer(
                 instance.author, context=context).data
         if isinstance(instance, Recipe):
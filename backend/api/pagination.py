@@ -1,6 +1,49 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
-class CustomPagination(PageNumberPagination):
+class KeysetPagination(CursorPagination):
+    """Постраничный вывод по ключу id без OFFSET и COUNT(*)."""
+
+    page_size = 6
+    page_size_query_param = 'recipes_limit'
+    ordering = '-id'
+
+    def window(self, request):
+        """(limit, before, after): сколько id нужно странице и с какой
+        стороны курсора их брать. Выборке хватает limit ближайших
+        к курсору id, чтобы построить страницу и ссылки на соседние."""
+        cursor = self.decode_cursor(request)
+        limit = self.get_page_size(request) + 1
+        if cursor is None or cursor.position is None:
+            return limit, None, None
+        limit += cursor.offset
+        if cursor.reverse:
+            return limit, None, int(cursor.position)
+        return limit, int(cursor.position), None
+
+
+class PagePagination(PageNumberPagination):
+    """Постраничный вывод по номеру страницы."""
+
     page_size = 6
     page_size_query_param = 'recipes_limit'
+
+
+class CustomPagination(PagePagination):
+    """Постраничный вывод по номеру страницы.
+    При наличии параметра cursor переключается на KeysetPagination."""
+
+    cursor_query_param = 'cursor'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import JSONParser
+from rest_framework.status import HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+class RequestTooLarge(APIException):
+    status_code = HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Тело запроса слишком большое.'
+    default_code = 'request_too_large'
+
+
+class SizeLimitedJSONParser(JSONParser):
+    """JSONParser, который отказывает по заголовку Content-Length,
+    не читая тело: DRF разбирает request.stream, и ограничение
+    DATA_UPLOAD_MAX_MEMORY_SIZE к нему не применяется."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        if request is not None:
+            try:
+                length = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                length = 0
+            if length > settings.RECIPE_REQUEST_MAX_SIZE:
+                raise RequestTooLarge(
+                    f'Тело запроса больше '
+                    f'{settings.RECIPE_REQUEST_MAX_SIZE} байт.'
+                )
+        return super().parse(stream, media_type, parser_context)
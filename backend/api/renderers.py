@@ -0,0 +1,113 @@
+import csv
+import os
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+INGREDIENT = 0
+MEASUREMENT_UNIT = 1
+AMOUNT = 2
+
+PDF_CHUNK_SIZE = 64 * 1024
+PDF_FONT_SIZE = 12
+PDF_LEADING = 18
+PDF_MARGIN = 50
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+    Потомки задают формат и построчно выдают файл в методе stream."""
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data)
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+
+class ShoppingCartTxtRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        for item in ingredients:
+            yield (
+                f'{item[INGREDIENT]} - {item[AMOUNT]} '
+                f'{item[MEASUREMENT_UNIT]}\n'
+            )
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('Ингредиент', 'Количество', 'Единица'))
+        for item in ingredients:
+            yield writer.writerow(
+                (item[INGREDIENT], item[AMOUNT], item[MEASUREMENT_UNIT])
+            )
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    """Список покупок в PDF. Таблица ссылок PDF пишется в конец файла,
+    поэтому документ собирается целиком до отдачи, но строки читаются
+    из итератора постранично, а файл уходит частями по PDF_CHUNK_SIZE."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data).encode()
+
+    @staticmethod
+    def font():
+        """Регистрирует шрифт SHOPPING_CART_PDF_FONT с кириллицей:
+        встроенные шрифты PDF её не содержат."""
+        path = settings.SHOPPING_CART_PDF_FONT
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(name, path))
+        return name
+
+    def stream(self, ingredients):
+        font = self.font()
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+        pdf.setTitle('Список покупок')
+        top = A4[1] - PDF_MARGIN
+        pdf.setFont(font, PDF_FONT_SIZE)
+        pdf.drawString(PDF_MARGIN, top, 'Список покупок')
+        y = top - 2 * PDF_LEADING
+        for item in ingredients:
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(font, PDF_FONT_SIZE)
+                y = top
+            pdf.drawString(
+                PDF_MARGIN, y,
+                f'{item[INGREDIENT]} - {item[AMOUNT]} '
+                f'{item[MEASUREMENT_UNIT]}'
+            )
+            y -= PDF_LEADING
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
@@ -0,0 +1,214 @@
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock
+
+from django.conf import settings
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.search import normalize
+from .cache import get_version
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Отсортированный массив нормализованных названий: совпадения по началу
+    ищутся бинарным поиском, по подстроке — проходом по массиву.
+    Индекс строится при первом поиске и сбрасывается при изменении
+    ингредиентов в этом процессе, при смене версии пространства
+    'ingredients' в общем кеше (изменения из других процессов и команд)
+    или по истечении INGREDIENT_INDEX_TTL секунд."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._names = None
+        self._ids = None
+        self._version = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._names = None
+
+    def _build(self, version):
+        entries = sorted(
+            (normalize(name), pk)
+            for pk, name in Ingredient.objects.values_list('id', 'name')
+        )
+        names = [name for name, _ in entries]
+        ids = [pk for _, pk in entries]
+        with self._lock:
+            self._names, self._ids = names, ids
+            self._version = version
+            self._built_at = time.monotonic()
+        return names, ids
+
+    def _entries(self):
+        version = get_version('ingredients')
+        with self._lock:
+            names, ids = self._names, self._ids
+            expired = (
+                version != self._version
+                or time.monotonic() - self._built_at
+                > settings.INGREDIENT_INDEX_TTL
+            )
+        if names is None or expired:
+            return self._build(version)
+        return names, ids
+
+    def search(self, query, limit=None):
+        """Возвращает id ингредиентов: сначала совпавшие по началу
+        названия, затем по подстроке."""
+        query = normalize(query)
+        if not query:
+            return []
+        names, ids = self._entries()
+        result = []
+        position = bisect_left(names, query)
+        while position < len(names) and names[position].startswith(query):
+            result.append(ids[position])
+            position += 1
+            if len(result) == limit:
+                return result
+        for name, pk in zip(names, ids):
+            if query in name and not name.startswith(query):
+                result.append(pk)
+                if len(result) == limit:
+                    break
+        return result
+
+
+class RecipeIngredientIndex:
+    """Индекс состава рецептов в памяти процесса для подбора рецептов
+    по имеющимся ингредиентам.
+
+    Для каждого рецепта хранятся кортежи id его ингредиентов и тегов
+    и время приготовления, для каждого ингредиента — список рецептов с ним.
+    Подбор складывает списки имеющихся ингредиентов и просматривает только
+    рецепты, в которых есть хотя бы один из них. Память растёт с числом
+    строк состава, а не с величиной id. Рецепт обновляется по сигналам
+    после фиксации транзакции; изменения из других процессов учитываются
+    при перестроении раз в RECIPE_MATCH_INDEX_TTL секунд."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._index = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    @staticmethod
+    def _load(recipe_ids=None):
+        """{id рецепта: (ингредиенты, теги, время)}."""
+        recipes = Recipe.objects.all()
+        links = IngredientInRecipe.objects.all()
+        tags = Recipe.tags.through.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+            links = links.filter(recipe_id__in=recipe_ids)
+            tags = tags.filter(recipe_id__in=recipe_ids)
+        ids = {}
+        ingredient_ids, tag_ids = defaultdict(list), defaultdict(list)
+        for recipe_id, ingredient_id in links.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator():
+            ingredient_ids[recipe_id].append(
+                ids.setdefault(ingredient_id, ingredient_id)
+            )
+        for recipe_id, tag_id in tags.values_list('recipe_id', 'tag_id'):
+            tag_ids[recipe_id].append(ids.setdefault(tag_id, tag_id))
+        return {
+            recipe_id: (
+                tuple(ingredient_ids.pop(recipe_id, ())),
+                tuple(tag_ids.pop(recipe_id, ())),
+                cooking_time
+            )
+            for recipe_id, cooking_time in recipes.values_list(
+                'id', 'cooking_time'
+            ).iterator()
+        }
+
+    @staticmethod
+    def _postings(recipes):
+        """{id ингредиента: [id рецептов с ним]}."""
+        postings = defaultdict(list)
+        for recipe_id, (ingredients, _, _) in recipes.items():
+            for ingredient_id in ingredients:
+                postings[ingredient_id].append(recipe_id)
+        return dict(postings)
+
+    def _entries(self):
+        with self._lock:
+            index = self._index
+            expired = (
+                time.monotonic() - self._built_at
+                > settings.RECIPE_MATCH_INDEX_TTL
+            )
+        if index is None or expired:
+            recipes = self._load()
+            index = recipes, self._postings(recipes)
+            with self._lock:
+                self._index = index
+                self._built_at = time.monotonic()
+        return index
+
+    def refresh(self, recipe_id):
+        """Перечитывает рецепт из базы, если индекс уже построен.
+        Удалённый рецепт убирается из индекса."""
+        with self._lock:
+            if self._index is None:
+                return
+        entry = self._load([recipe_id]).get(recipe_id)
+        with self._lock:
+            if self._index is None:
+                return
+            recipes, postings = map(dict, self._index)
+            previous = recipes.pop(recipe_id, None)
+            for ingredient_id in previous[0] if previous else ():
+                postings[ingredient_id] = [
+                    pk for pk in postings[ingredient_id] if pk != recipe_id
+                ]
+            if entry is not None:
+                recipes[recipe_id] = entry
+                for ingredient_id in entry[0]:
+                    postings[ingredient_id] = postings.get(
+                        ingredient_id, []
+                    ) + [recipe_id]
+            self._index = recipes, postings
+
+    def match(
+        self, ingredient_ids, tag_ids=None, max_cooking_time=None,
+        max_missing=None
+    ):
+        """Рецепты, в которых есть хотя бы один из ингредиентов:
+        [(id рецепта, недостаёт, есть), ...] по возрастанию числа
+        недостающих, затем по убыванию доли имеющихся."""
+        recipes, postings = self._entries()
+        found = Counter()
+        for ingredient_id in set(ingredient_ids):
+            found.update(postings.get(ingredient_id, ()))
+        tags = set(tag_ids or ())
+        matches = []
+        for recipe_id, matched in found.items():
+            ingredients, recipe_tags, cooking_time = recipes[recipe_id]
+            if tags and tags.isdisjoint(recipe_tags):
+                continue
+            if (
+                max_cooking_time is not None
+                and cooking_time > max_cooking_time
+            ):
+                continue
+            missing = len(ingredients) - matched
+            if max_missing is None or missing <= max_missing:
+                matches.append((recipe_id, missing, matched))
+        matches.sort(key=lambda match: (
+            match[1], -match[2] / (match[1] + match[2]), -match[0]
+        ))
+        return matches
+
+
+ingredient_index = IngredientIndex()
+recipe_ingredient_index = RecipeIngredientIndex()
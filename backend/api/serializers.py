@@ -1,17 +1,27 @@
+from operator import attrgetter
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework.serializers import (
-    IntegerField, ModelSerializer, PrimaryKeyRelatedField,
-    SerializerMethodField, StringRelatedField, ValidationError
+    IntegerField, ListField, ListSerializer, ModelSerializer,
+    PrimaryKeyRelatedField, Serializer, SerializerMethodField,
+    StringRelatedField, ValidationError
 )
 from rest_framework.validators import UniqueTogetherValidator
 
+from recipes.images import schedule_image_processing
 from recipes.models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
+    ShoppingListItem, Tag
 )
 from users.models import Subscribe
-from .mixins import CreatePopItems, IsSubscribed, RepresentationMixin
+from .fields import BulkPrimaryKeyRelatedField, StreamingBase64ImageField
+from .mixins import (
+    CreatePopItems, ImageSrcset, IsSubscribed, RepresentationMixin,
+    set_prefetched
+)
+from .services import get_recipes_limit
 
 User = get_user_model()
 
@@ -54,31 +64,43 @@ class IngredientInRecipeObtainSerializer(ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeObtainSerializer(ModelSerializer):
+class RecipeObtainSerializer(ModelSerializer, ImageSrcset):
     tags = TagSerializer(read_only=True, many=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = SerializerMethodField(read_only=True)
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
+    image_srcset = SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+            'is_in_shopping_cart', 'name', 'image', 'image_srcset', 'text',
+            'cooking_time',
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_ingredients(self, obj):
-        queryset = IngredientInRecipe.objects.filter(recipe=obj)
-        return IngredientInRecipeObtainSerializer(queryset, many=True).data
+        return IngredientInRecipeObtainSerializer(
+            obj.amount.all(), many=True
+        ).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
         return Favorite.objects.filter(user=request.user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -87,20 +109,34 @@ class RecipeObtainSerializer(ModelSerializer):
         ).exists()
 
 
+class IngredientInRecipeListSerializer(ListSerializer):
+    """Загружает ингредиенты всех элементов списка одним запросом."""
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = BulkPrimaryKeyRelatedField(
+            queryset=Ingredient.objects.all(), many=True
+        ).resolve([item['id'] for item in items])
+        for item, ingredient in zip(items, ingredients):
+            item['id'] = ingredient
+        return items
+
+
 class IngredientInRecipeCreateSerializer(ModelSerializer):
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = IntegerField(min_value=1)
     amount = IntegerField(min_value=1)
 
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'amount',)
+        list_serializer_class = IngredientInRecipeListSerializer
 
 
 class RecipeCreateSerializer(RepresentationMixin, CreatePopItems):
-    tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientInRecipeCreateSerializer(many=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -110,46 +146,104 @@ class RecipeCreateSerializer(RepresentationMixin, CreatePopItems):
         )
 
     def validate(self, data):
-        unique_ingredients = []
-        for ingredient in data.get('ingredients'):
-            if ingredient['id'] in unique_ingredients:
-                raise ValidationError({
-                    'ingredients': 'Ингредиенты не должны повторяться'
-                })
-            unique_ingredients.append(ingredient['id'])
+        ingredients = data.get('ingredients')
+        if len({ingredient['id'] for ingredient in ingredients}) < len(
+            ingredients
+        ):
+            raise ValidationError({
+                'ingredients': 'Ингредиенты не должны повторяться'
+            })
 
         tags = data.get('tags')
         if not tags:
             raise ValidationError({'tags': 'Выберите тэг'})
-        unique_tags = []
-        for tag in tags:
-            if tag in unique_tags:
-                raise ValidationError({'tags': 'Тэги должны быть уникальными'})
-            unique_tags.append(tag)
+        if len(set(tags)) < len(tags):
+            raise ValidationError({'tags': 'Тэги должны быть уникальными'})
         return data
 
+    def to_representation(self, instance):
+        for name, objects in getattr(self, 'written', {}).items():
+            set_prefetched(instance, name, objects)
+        return super().to_representation(instance)
+
     def create(self, validated_data):
         tags, ingredients = self.pop_items(validated_data)
         recipe = Recipe.objects.create(**validated_data)
-        self.create_ingredients(recipe, ingredients)
-        self.create_tags(recipe, tags)
+        items = self.create_ingredients(recipe, ingredients)
+        recipe.tags.add(*tags)
+        recipe.update_search_index(
+            [ingredient['id'].name for ingredient in ingredients]
+        )
+        schedule_image_processing(recipe)
+        self.written = {'amount': items, 'tags': tags}
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
+        recipe.author_is_subscribed = False
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
-        recipe.tags.clear()
-        IngredientInRecipe.objects.filter(recipe=recipe).delete()
         tags, ingredients = self.pop_items(validated_data)
-        self.create_ingredients(recipe, ingredients)
-        self.create_tags(recipe, tags)
-        return super().update(recipe, validated_data)
+        items, changes = self.update_ingredients(recipe, ingredients)
+        ShoppingListItem.objects.apply_recipe_changes(recipe.id, changes)
+        recipe.tags.set(tags)
+        previous_image = recipe.image.name
+        recipe = super().update(recipe, validated_data)
+        recipe.update_search_index([item.ingredient.name for item in items])
+        if recipe.image.name != previous_image:
+            schedule_image_processing(recipe)
+        self.written = {
+            'amount': sorted(items, key=attrgetter('id')),
+            'tags': sorted(tags, key=attrgetter('id')),
+        }
+        return recipe
 
 
-class RecipeSerializer(ModelSerializer):
+class RecipeBatchSerializer(Serializer):
+    """Сериализатор списка id рецептов для пакетных операций."""
+
+    recipes = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
+class RecipeMatchQuerySerializer(Serializer):
+    """Сериализатор параметров подбора рецептов по ингредиентам."""
+
+    ingredients = BulkPrimaryKeyRelatedField(
+        queryset=Ingredient.objects.only('id'),
+        many=True,
+        allow_empty=False,
+        max_length=100
+    )
+    tags = BulkPrimaryKeyRelatedField(
+        queryset=Tag.objects.only('id'),
+        many=True,
+        required=False
+    )
+    max_cooking_time = IntegerField(min_value=1, required=False)
+    max_missing = IntegerField(min_value=0, required=False)
+
+
+class RecipeMatchSerializer(RecipeObtainSerializer):
+    """Рецепт с числом имеющихся и недостающих ингредиентов."""
+
+    matched = IntegerField(read_only=True)
+    missing = IntegerField(read_only=True)
+
+    class Meta(RecipeObtainSerializer.Meta):
+        fields = RecipeObtainSerializer.Meta.fields + ('matched', 'missing')
+
+
+class RecipeSerializer(ModelSerializer, ImageSrcset):
     """Сериализатор для получения ограниченной версии модели Recipe."""
 
+    image_srcset = SerializerMethodField(read_only=True)
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
 
 
 class SubscribeSerializer(RepresentationMixin):
@@ -178,7 +272,7 @@ class SubscriptionsSerializer(ModelSerializer, IsSubscribed):
 
     is_subscribed = SerializerMethodField(read_only=True)
     recipes = SerializerMethodField(read_only=True)
-    recipes_count = IntegerField(source='recipes.count', read_only=True)
+    recipes_count = IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -191,10 +285,12 @@ class SubscriptionsSerializer(ModelSerializer, IsSubscribed):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        recipes_limit = request.query_params.get('recipes_limit')
+        if hasattr(obj, 'recipes_preview'):
+            return RecipeSerializer(obj.recipes_preview, many=True).data
         queryset = Recipe.objects.filter(author=obj)
+        recipes_limit = get_recipes_limit(request)
         if recipes_limit:
-            queryset = queryset[:int(recipes_limit)]
+            queryset = queryset[:recipes_limit]
         return RecipeSerializer(queryset, many=True).data
 
 
@@ -1,17 +1,22 @@
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 
-INGREDIENT = 0
-AMOUNT = 2
-MEASUREMENT_UNIT = 1
 
-
-def create_shopping_cart_txt(ingredients):
-    purchases = []
-    for item in ingredients:
-        purchases.append(
-            f'{item[INGREDIENT]} - {item[AMOUNT]} {item[MEASUREMENT_UNIT]}\n'
-        )
-    response = HttpResponse(content_type='text/plain')
-    response['Content-Disposition'] = 'attachment; filename=Purchases.txt'
-    response.writelines(purchases)
+def stream_shopping_cart(ingredients, renderer):
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type += f'; charset={renderer.charset}'
+    response = StreamingHttpResponse(
+        renderer.stream(ingredients.iterator()), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename=Purchases.{renderer.format}'
+    )
     return response
+
+
+def get_recipes_limit(request):
+    """Возвращает положительное значение recipes_limit или None."""
+    value = request.query_params.get('recipes_limit', '')
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    return None
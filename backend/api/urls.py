@@ -3,7 +3,8 @@ from djoser.views import TokenCreateView, TokenDestroyView
 from rest_framework.routers import DefaultRouter
 
 from .views import (
-    CustomUserViewSet, IngredientViewSet, RecipeViewSet, TagViewSet
+    CustomUserViewSet, IngredientViewSet, MetricsView, RecipeViewSet,
+    TagViewSet
 )
 
 router = DefaultRouter()
@@ -16,5 +17,6 @@ router.register('recipes', RecipeViewSet, 'recipes')
 urlpatterns = [
     path('auth/token/login/', TokenCreateView.as_view()),
     path('auth/token/logout/', TokenDestroyView.as_view()),
+    path('_metrics/', MetricsView.as_view()),
     path('', include(router.urls)),
 ]
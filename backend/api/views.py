@@ -1,28 +1,50 @@
-from django.db.models.aggregates import Sum
-from django.shortcuts import get_list_or_404, get_object_or_404
+from functools import partial
+
+from django.db.models import (
+    BooleanField, Count, Exists, Max, OuterRef, Prefetch, Value
+)
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import (
+    SAFE_METHODS, AllowAny, IsAdminUser, IsAuthenticated
+)
 from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST
 )
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
 from recipes.models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+    Favorite, FeedEntry, Ingredient, IngredientInRecipe, Recipe,
+    RecipeNeighbour, ShoppingCart, ShoppingListItem, Tag
 )
 from users.models import Subscribe
+from .cache import (
+    CachedResponseMixin, conditional_response, user_etag
+)
 from .filters import IngredientFilter, RecipeFilter
+from .metrics import registry
 from .mixins import CreateDestroy
-from .pagination import CustomPagination
+from .pagination import (
+    CustomPagination, KeysetPagination, PagePagination
+)
+from .parsers import SizeLimitedJSONParser
 from .permissions import IsAuthorOrReadOnly
+from .renderers import (
+    ShoppingCartCSVRenderer, ShoppingCartPDFRenderer, ShoppingCartTxtRenderer
+)
 from .serializers import (
     CustomUserSerializer, FavoriteSerializer, IngredientSerializer,
-    RecipeCreateSerializer, RecipeObtainSerializer, ShoppingCartSerializer,
+    RecipeBatchSerializer, RecipeCreateSerializer, RecipeMatchQuerySerializer,
+    RecipeMatchSerializer, RecipeObtainSerializer, ShoppingCartSerializer,
     SubscribeSerializer, SubscriptionsSerializer, TagSerializer, User
 )
-from .services import create_shopping_cart_txt
+from .search import recipe_ingredient_index
+from .services import get_recipes_limit, stream_shopping_cart
 
 
 class CustomUserViewSet(UserViewSet):
@@ -30,6 +52,18 @@ class CustomUserViewSet(UserViewSet):
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            is_subscribed = Value(False, output_field=BooleanField())
+        else:
+            is_subscribed = Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('pk')
+            ))
+        return super().get_queryset().annotate(
+            is_subscribed=is_subscribed
+        ).order_by('id')
+
     @action(
         ['post', 'delete'], detail=True, permission_classes=[IsAuthenticated])
     def subscribe(self, request, id):
@@ -56,7 +90,24 @@ class CustomUserViewSet(UserViewSet):
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         user = request.user
-        queryset = get_list_or_404(User, followings__user=user)
+        recipes = Recipe.objects.only(
+            'id', 'author_id', 'name', 'image', 'image_variants',
+            'cooking_time'
+        )
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit:
+            recipes = recipes[:recipes_limit]
+        queryset = (
+            User.objects
+            .filter(followings__user=user)
+            .annotate(
+                is_subscribed=Value(True, output_field=BooleanField())
+            )
+            .prefetch_related(Prefetch(
+                'recipes', queryset=recipes, to_attr='recipes_preview'
+            ))
+            .order_by('-id')
+        )
         pages = self.paginate_queryset(queryset)
         serializer = SubscriptionsSerializer(
             pages, many=True, context={'request': request}
@@ -64,13 +115,15 @@ class CustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CachedResponseMixin, ReadOnlyModelViewSet):
+    cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CachedResponseMixin, ReadOnlyModelViewSet):
+    cache_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -83,15 +136,149 @@ class RecipeViewSet(CreateDestroy):
     pagination_class = CustomPagination
     filterset_class = RecipeFilter
     filterset_fields = ('author', )
+    parser_classes = (SizeLimitedJSONParser, FormParser, MultiPartParser)
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = (
+            Recipe.objects
+            .select_related('author')
+            .defer('search_document')
+            .prefetch_related(
+                'tags',
+                Prefetch(
+                    'amount',
+                    queryset=IngredientInRecipe.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )
+        )
+        if user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return queryset.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author')
+            ))
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator.cursor_query_param in request.query_params:
+            # Отметка ниже — COUNT по всей выборке, от которого
+            # постраничный вывод по ключу как раз избавляет.
+            return super().list(request, *args, **kwargs)
+        stamps = {'count': Count('id'), 'updated': Max('updated_at')}
+        if request.query_params.get('ordering') == 'popular':
+            stamps['favorites'] = Max('favorites_changed_at')
+        stamp = self.filter_queryset(Recipe.objects.all()).aggregate(**stamps)
+        return conditional_response(
+            request,
+            user_etag(request, *stamp.values()),
+            partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        updated = None
+        if str(kwargs['pk']).isdigit():
+            updated = Recipe.objects.filter(
+                pk=kwargs['pk']
+            ).values_list('updated_at', flat=True).first()
+        if updated is None:
+            return super().retrieve(request, *args, **kwargs)
+        return conditional_response(
+            request,
+            user_etag(request, updated),
+            partial(super().retrieve, request, *args, **kwargs)
+        )
 
     def get_serializer_class(self):
-        if self.action == 'get':
+        if self.request.method in SAFE_METHODS:
             return RecipeObtainSerializer
         return RecipeCreateSerializer
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=KeysetPagination
+    )
+    def feed(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        limit, before, after = self.paginator.window(request)
+        page = self.paginate_queryset(queryset.filter(
+            id__in=FeedEntry.objects.recipe_ids(
+                request.user, limit, before=before, after=after,
+                recipes=queryset
+            )
+        ))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, permission_classes=[AllowAny])
+    def similar(self, request, pk):
+        recipe = get_object_or_404(Recipe.objects.only('id'), id=pk)
+        queryset = self.get_queryset().filter(
+            neighbour_of__recipe=recipe
+        ).order_by('-neighbour_of__score', '-id')
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit:
+            queryset = queryset[:recipes_limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def recommended(self, request):
+        queryset = RecipeNeighbour.objects.recommend(
+            self.filter_queryset(self.get_queryset()), request.user
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        permission_classes=[AllowAny],
+        pagination_class=PagePagination
+    )
+    def by_ingredients(self, request):
+        query = RecipeMatchQuerySerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+        matches = recipe_ingredient_index.match(
+            [ingredient.id for ingredient in data['ingredients']],
+            tag_ids=[tag.id for tag in data.get('tags', ())],
+            max_cooking_time=data.get('max_cooking_time'),
+            max_missing=data.get('max_missing')
+        )
+        page = self.paginate_queryset(matches)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        found = []
+        for recipe_id, missing, matched in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.missing, recipe.matched = missing, matched
+                found.append(recipe)
+        serializer = RecipeMatchSerializer(
+            found, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=["POST"])
     def favorite(self, request, pk):
         return self._post_method_for_actions(
@@ -102,6 +289,23 @@ class RecipeViewSet(CreateDestroy):
         return self._delete_method_for_actions(
             request=request, pk=pk, model=Favorite)
 
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='favorite/batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        return self._batch_method_for_actions(
+            request=request, serializers=RecipeBatchSerializer,
+            model=Favorite)
+
+    @favorite_batch.mapping.delete
+    def delete_favorite_batch(self, request):
+        return self._batch_method_for_actions(
+            request=request, serializers=RecipeBatchSerializer,
+            model=Favorite)
+
     @action(detail=True, methods=["POST"])
     def shopping_cart(self, request, pk):
         return self._post_method_for_actions(
@@ -112,14 +316,52 @@ class RecipeViewSet(CreateDestroy):
         return self._delete_method_for_actions(
             request=request, pk=pk, model=ShoppingCart)
 
-    @action(detail=False, permission_classes=[IsAuthenticated])
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='shopping_cart/batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        return self._batch_method_for_actions(
+            request=request, serializers=RecipeBatchSerializer,
+            model=ShoppingCart)
+
+    @shopping_cart_batch.mapping.delete
+    def delete_shopping_cart_batch(self, request):
+        return self._batch_method_for_actions(
+            request=request, serializers=RecipeBatchSerializer,
+            model=ShoppingCart)
+
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            ShoppingCartTxtRenderer, ShoppingCartCSVRenderer,
+            ShoppingCartPDFRenderer
+        ]
+    )
     def download_shopping_cart(self, request):
         ingredients = (
-            IngredientInRecipe.objects
-            .select_related('ingredient', 'recipe')
-            .prefetch_related('purchases')
-            .filter(recipe__purchases__user=request.user)
-            .values_list('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(Sum('amount'))
+            ShoppingListItem.objects
+            .filter(user=request.user)
+            .values_list(
+                'ingredient__name',
+                'ingredient__measurement_unit',
+                'total_amount'
+            )
+            .order_by('ingredient__name')
+        )
+        return stream_shopping_cart(ingredients, request.accepted_renderer)
+
+
+class MetricsView(APIView):
+    """Метрики запросов текущего процесса в формате Prometheus."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
         )
-        return create_shopping_cart_txt(ingredients)
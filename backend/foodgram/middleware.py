@@ -1,5 +1,12 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
 from django.http import JsonResponse
 
+from api.metrics import registry
+
 
 class Process500:
     def __init__(self, get_response):
@@ -10,3 +17,61 @@ class Process500:
 
     def process_exception(self, request, exception):
         return JsonResponse({'success': False, 'error': str(exception)})
+
+
+def endpoint(request):
+    """Имя представления и действия вьюсета, например
+    ('RecipeViewSet.list', 'GET')."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved', request.method
+    view = match.func
+    view_class = getattr(view, 'cls', None) or getattr(
+        view, 'view_class', None
+    )
+    if view_class is None:
+        return f'{view.__module__}.{view.__name__}', request.method
+    action = getattr(view, 'actions', {}).get(request.method.lower())
+    name = view_class.__name__
+    return (name if action is None else f'{name}.{action}'), request.method
+
+
+class Metrics:
+    """Считает время ответа, число и время SQL-запросов, повторяющиеся
+    запросы и размер ответа по каждому представлению, добавляет
+    заголовок Server-Timing. Выключенный (METRICS_ENABLED = False)
+    убирается из цепочки при старте и ничего не стоит.
+
+    У потоковых ответов учитываются только запросы до начала отдачи."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self._get_response = get_response
+
+    def __call__(self, request):
+        queries = []
+
+        def timed(execute, sql, params, many, context):
+            started = perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append((sql, perf_counter() - started))
+
+        started = perf_counter()
+        with connection.execute_wrapper(timed):
+            response = self._get_response(request)
+        duration = perf_counter() - started
+        sql_time = sum(elapsed for _, elapsed in queries)
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'db;dur={sql_time * 1000:.1f};desc="{len(queries)} queries"'
+        )
+        registry.record(
+            endpoint(request),
+            duration,
+            queries,
+            0 if response.streaming else len(response.content)
+        )
+        return response
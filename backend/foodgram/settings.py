@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.Metrics',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +73,15 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='/var/tmp/foodgram'),
+    }
+}
+
+API_CACHE_TIMEOUT = 60 * 60 * 24
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -128,3 +138,32 @@ DJOSER = {
     },
     'HIDE_USERS': False
 }
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', default=300))
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_TRIGRAM_THRESHOLD = 0.3
+RECIPE_MATCH_INDEX_TTL = int(os.getenv('RECIPE_MATCH_INDEX_TTL', default=300))
+
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', default=2))
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+RECIPE_IMAGE_FORMATS = ('webp', 'avif')
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_MAX_ATTEMPTS = 3
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', default=10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+
+RECIPE_REQUEST_MAX_SIZE = RECIPE_IMAGE_MAX_SIZE * 4 // 3 + 1024 * 1024
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+FEED_MAX_LENGTH = 500
+FEED_PUSH_MAX_FOLLOWERS = int(os.getenv('FEED_PUSH_MAX_FOLLOWERS', default=5000))
+
+RECOMMENDATION_NEIGHBOURS = 20
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='False') == 'True'
+METRICS_MAX_FINGERPRINTS = 20
+METRICS_MAX_QUERY_LENGTH = 200
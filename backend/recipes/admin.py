@@ -1,7 +1,11 @@
+from collections import defaultdict
+
 from django.contrib import admin
 
+from .images import schedule_image_processing
 from .models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
+    ShoppingListItem, Tag
 )
 
 
@@ -20,14 +24,32 @@ class IngredientInRecipeInline(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author',)
+    list_display = ('id', 'name', 'author', 'favorites_count',)
     list_filter = ('author', 'name', 'tags',)
-    readonly_fields = ('count_favourites',)
+    readonly_fields = ('favorites_count',)
     inlines = [IngredientInRecipeInline]
 
-    @admin.display(description='В избранном')
-    def count_favourites(self, obj):
-        return obj.favourites.count()
+    @staticmethod
+    def ingredient_amounts(recipe):
+        amounts = defaultdict(int)
+        for ingredient_id, amount in IngredientInRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount'):
+            amounts[ingredient_id] += amount
+        return amounts
+
+    def save_related(self, request, form, formsets, change):
+        before = self.ingredient_amounts(form.instance) if change else {}
+        super().save_related(request, form, formsets, change)
+        after = self.ingredient_amounts(form.instance)
+        ShoppingListItem.objects.apply_recipe_changes(form.instance.id, {
+            ingredient_id: after.get(ingredient_id, 0)
+            - before.get(ingredient_id, 0)
+            for ingredient_id in {*before, *after}
+        })
+        form.instance.update_search_index()
+        if 'image' in form.changed_data:
+            schedule_image_processing(form.instance)
 
 
 class ShoppinpCartAdmin(admin.ModelAdmin):
@@ -38,8 +60,14 @@ class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe',)
 
 
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'total_amount',)
+    readonly_fields = ('user', 'ingredient', 'total_amount',)
+
+
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(ShoppingCart, ShoppinpCartAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
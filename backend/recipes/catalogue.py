@@ -0,0 +1,71 @@
+"""Потоковое чтение и запись каталога ингредиентов в JSON и CSV."""
+import csv
+import json
+import re
+
+from .search import SPACES
+
+CSV_FIELDS = ('name', 'measurement_unit')
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_array(stream, chunk_size=1 << 16):
+    """Выдаёт элементы JSON-массива по одному, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив')
+    position, eof = 1, False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+
+
+def read_json(stream):
+    for item in iter_json_array(stream):
+        fields = item.get('fields', item)
+        yield fields.get('name', ''), fields.get('measurement_unit', '')
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield row.get('name') or '', row.get('measurement_unit') or ''
+
+
+def clean(value):
+    return SPACES.sub(' ', value).strip()
+
+
+def write_json(stream, rows):
+    stream.write('[')
+    for number, (pk, name, measurement_unit) in enumerate(rows):
+        if number:
+            stream.write(',\n')
+        stream.write(json.dumps({
+            'model': 'recipes.ingredient',
+            'pk': pk,
+            'fields': {'name': name, 'measurement_unit': measurement_unit},
+        }, ensure_ascii=False))
+    stream.write(']\n')
+
+
+def write_csv(stream, rows):
+    writer = csv.writer(stream)
+    writer.writerow(CSV_FIELDS)
+    for _, name, measurement_unit in rows:
+        writer.writerow((name, measurement_unit))
+
+
+READERS = {'json': read_json, 'csv': read_csv}
+WRITERS = {'json': write_json, 'csv': write_csv}
@@ -0,0 +1,133 @@
+"""Фоновая обработка картинок рецептов: уменьшенные копии
+в WebP и AVIF без метаданных."""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import Recipe, RecipeImageJob
+
+logger = logging.getLogger(__name__)
+
+PIL_FORMATS = {'webp': 'WEBP', 'avif': 'AVIF'}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images'
+)
+
+
+def image_formats():
+    return [
+        extension for extension in settings.RECIPE_IMAGE_FORMATS
+        if features.check(extension)
+    ]
+
+
+def schedule_image_processing(recipe):
+    """Ставит картинку рецепта в очередь после фиксации транзакции.
+    До окончания обработки у рецепта нет уменьшенных копий."""
+    recipe.image_variants = {}
+    Recipe.objects.filter(id=recipe.id).update(image_variants={})
+    job = RecipeImageJob.objects.create(recipe=recipe)
+    transaction.on_commit(lambda: executor.submit(run_job, job.id))
+    return job
+
+
+def run_job(job_id):
+    try:
+        process_job(job_id)
+    except Exception:
+        logger.exception('Не удалось обработать картинку, задание %s', job_id)
+    finally:
+        connection.close()
+
+
+def process_job(job_id):
+    claimed = RecipeImageJob.objects.filter(
+        id=job_id,
+        status__in=(RecipeImageJob.PENDING, RecipeImageJob.FAILED)
+    ).update(
+        status=RecipeImageJob.PROCESSING,
+        attempts=F('attempts') + 1,
+        updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = RecipeImageJob.objects.select_related('recipe').get(id=job_id)
+    if RecipeImageJob.objects.filter(
+        recipe_id=job.recipe_id, id__gt=job.id
+    ).exists():
+        job.status = RecipeImageJob.DONE
+        job.save(update_fields=['status', 'updated_at'])
+        return
+    try:
+        variants = render_variants(job.recipe, prefix=job.id)
+    except Exception as error:
+        job.status = RecipeImageJob.FAILED
+        job.error = str(error)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+    if not Recipe.objects.filter(id=job.recipe_id).update(
+        image_variants=variants, updated_at=timezone.now()
+    ):
+        # Рецепт удалён вместе с заданием, пока шла обработка.
+        delete_stale_variants(job.recipe_id, keep=set())
+        return
+    delete_stale_variants(job.recipe_id, keep=set(variant_names(variants)))
+    job.status = RecipeImageJob.DONE
+    job.error = ''
+    job.save(update_fields=['status', 'error', 'updated_at'])
+
+
+def variant_names(variants):
+    for sizes in variants.values():
+        yield from sizes.values()
+
+
+def delete_stale_variants(recipe_id, keep):
+    directory = f'recipes/variants/{recipe_id}'
+    if not default_storage.exists(directory):
+        return
+    for filename in default_storage.listdir(directory)[1]:
+        name = f'{directory}/{filename}'
+        if name not in keep:
+            default_storage.delete(name)
+
+
+def render_variants(recipe, prefix):
+    """Возвращает {формат: {ширина: имя файла в хранилище}}."""
+    with recipe.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    widths = sorted({
+        min(width, image.width) for width in settings.RECIPE_IMAGE_WIDTHS
+    })
+    variants = {}
+    for width in widths:
+        resized = image.copy()
+        resized.thumbnail((width, image.height))
+        for extension in image_formats():
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                PIL_FORMATS[extension],
+                quality=settings.RECIPE_IMAGE_QUALITY
+            )
+            variants.setdefault(extension, {})[str(resized.width)] = (
+                default_storage.save(
+                    f'recipes/variants/{recipe.id}/{prefix}-{width}.'
+                    f'{extension}',
+                    ContentFile(buffer.getvalue())
+                )
+            )
+    return variants
@@ -0,0 +1,86 @@
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.recommendations import BACKENDS, Interactions, similar_recipes
+from .generate_dataset import zipf_weights
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет расчёт похожих рецептов на синтетических данных '
+        'в памяти, без базы: по умолчанию миллион пар пользователь–рецепт '
+        'с популярностью рецептов по степенному закону.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--favorites', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--recipes', type=int, default=20_000)
+        parser.add_argument('--exponent', type=float, default=1.1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--rows', type=int,
+            help='Считать соседей только для стольких случайных рецептов, '
+                 'время полного пересчёта экстраполируется'
+        )
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Замерить пик памяти на построение матрицы '
+                 '(tracemalloc замедляет построение в несколько раз)'
+        )
+        parser.add_argument(
+            '--backend', choices=sorted(BACKENDS), action='append',
+            help='По умолчанию — все доступные'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        matrix = Interactions(zip(
+            rng.choices(range(options['users']), k=options['favorites']),
+            rng.choices(
+                range(options['recipes']),
+                cum_weights=zipf_weights(
+                    options['recipes'], options['exponent']
+                ),
+                k=options['favorites']
+            )
+        ))
+        line = (
+            f'Матрица {matrix.shape[0]}×{matrix.shape[1]}, '
+            f'ненулевых {len(matrix)}: {time.perf_counter() - started:.1f} с'
+        )
+        if options['memory']:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            line += f', пик памяти {peak / 2 ** 20:.0f} МБ'
+        self.stdout.write(line)
+        recipe_ids = None
+        if options['rows']:
+            recipe_ids = rng.sample(
+                matrix.recipe_ids, min(options['rows'], matrix.shape[1])
+            )
+        for backend in options['backend'] or sorted(BACKENDS):
+            self.measure(matrix, recipe_ids, backend)
+
+    def measure(self, matrix, recipe_ids, backend):
+        started = time.perf_counter()
+        rows = neighbours = 0
+        for _, similar in similar_recipes(
+            matrix, settings.RECOMMENDATION_NEIGHBOURS, recipe_ids, backend
+        ):
+            rows += 1
+            neighbours += len(similar)
+        elapsed = time.perf_counter() - started
+        full = elapsed * matrix.shape[1] / rows if rows else 0
+        self.stdout.write(
+            f'{backend:<8} рецептов {rows}, соседей {neighbours}: '
+            f'{elapsed:.1f} с, {rows / elapsed:.0f} рецептов/с, '
+            f'полный пересчёт ≈ {full:.0f} с'
+        )
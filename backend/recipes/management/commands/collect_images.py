@@ -0,0 +1,106 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from recipes.images import variant_names
+from recipes.models import ImageBlob, Recipe
+from recipes.storage import image_storage
+
+IMAGES = 'recipes'
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок рецептов и их уменьшенных копий, на которые '
+        'не ссылается ни один рецепт. С флагом --recount сначала '
+        'пересчитывает ссылки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=60,
+            help='Не трогать файлы, изменённые позже этого срока'
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Пересчитать число ссылок по таблице рецептов'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, какие файлы будут удалены'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        if options['recount']:
+            self.recount()
+        referenced = set()
+        for image, variants in Recipe.objects.values_list(
+            'image', 'image_variants'
+        ).iterator():
+            referenced.add(image)
+            referenced.update(variant_names(variants))
+        known = set(ImageBlob.objects.values_list('name', flat=True))
+        orphans = [
+            name for name in ImageBlob.objects.filter(
+                refcount=0, updated_at__lt=cutoff
+            ).values_list('name', flat=True)
+            if name not in referenced
+        ]
+        strays = [
+            name for name in self.walk(IMAGES)
+            if name not in known and name not in referenced
+            and image_storage.get_modified_time(name) < cutoff
+        ]
+        if options['dry_run']:
+            for name in orphans + strays:
+                self.stdout.write(name)
+            self.stdout.write(
+                f'Будет удалено файлов: {len(orphans) + len(strays)}'
+            )
+            return
+        deleted = sum(self.delete_orphan(name) for name in orphans)
+        for name in strays:
+            image_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {deleted + len(strays)}'
+        ))
+
+    def walk(self, directory):
+        if not image_storage.exists(directory):
+            return
+        directories, files = image_storage.listdir(directory)
+        for filename in files:
+            yield os.path.join(directory, filename)
+        for subdirectory in directories:
+            yield from self.walk(os.path.join(directory, subdirectory))
+
+    @staticmethod
+    def delete_orphan(name):
+        deleted, _ = ImageBlob.objects.filter(name=name, refcount=0).delete()
+        if deleted:
+            image_storage.delete(name)
+        return deleted
+
+    @staticmethod
+    def recount():
+        actual = dict(
+            Recipe.objects.exclude(image='').order_by().values(
+                'image'
+            ).annotate(total=Count('pk')).values_list('image', 'total')
+        )
+        with transaction.atomic():
+            blobs = list(ImageBlob.objects.select_for_update())
+            for blob in blobs:
+                blob.refcount = actual.pop(blob.name, 0)
+            ImageBlob.objects.bulk_update(blobs, ['refcount'])
+            ImageBlob.objects.bulk_create(
+                ImageBlob(name=name, refcount=total)
+                for name, total in actual.items()
+            )
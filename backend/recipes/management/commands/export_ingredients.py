@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.catalogue import WRITERS
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает каталог ингредиентов в JSON (формат loaddata) '
+        'или CSV. Путь «-» — вывод в stdout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или «-»')
+        parser.add_argument(
+            '--format', choices=sorted(WRITERS),
+            help='Формат файла, по умолчанию — по расширению'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in WRITERS:
+            raise CommandError(f'Неизвестный формат: {file_format}')
+        rows = Ingredient.objects.order_by('id').values_list(
+            'id', 'name', 'measurement_unit'
+        ).iterator(chunk_size=5000)
+        if path == '-':
+            WRITERS[file_format](sys.stdout, rows)
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            WRITERS[file_format](stream, rows)
@@ -0,0 +1,206 @@
+import random
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from PIL import Image
+
+from recipes.models import (
+    Favorite, ImageBlob, Ingredient, IngredientInRecipe, Recipe,
+    ShoppingCart, Tag, User
+)
+from recipes.storage import image_storage
+from users.models import Subscribe
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2C94C', 'dessert'),
+    ('Перекус', '#56CCF2', 'snack'),
+)
+PASSWORD = 'benchmark-password'
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса популярности: k-й по популярности объект
+    выбирается в k^exponent раз реже первого."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def sample(rng, population, cum_weights, count):
+    """До count разных элементов с учётом популярности."""
+    chosen = set(rng.choices(population, cum_weights=cum_weights, k=count))
+    return list(chosen)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетические данные для нагрузочных замеров: '
+        'пользователей, рецепты, избранное, корзины и подписки. '
+        'Популярность авторов, рецептов и ингредиентов распределена '
+        'по степенному закону. Одинаковый --seed даёт одинаковые данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Префикс имён пользователей и названий рецептов'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=30,
+            help='Среднее число рецептов в избранном у пользователя'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=8,
+            help='Среднее число рецептов в корзине у пользователя'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее число подписок у пользователя'
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель степенного закона популярности'
+        )
+        parser.add_argument(
+            '--ingredients',
+            default=settings.BASE_DIR / 'data' / 'ingredients.json',
+            help='Каталог ингредиентов, если таблица пуста'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', str(options['ingredients']))
+        with transaction.atomic():
+            tags = self.create_tags()
+            users = self.create_users(options)
+            recipes = self.create_recipes(rng, users, options)
+            self.create_ingredients(rng, recipes, options)
+            self.create_tag_links(rng, recipes, tags)
+            self.create_graphs(rng, users, recipes, options)
+        for command in (
+            'reconcile_counters', 'rebuild_search_index', 'rebuild_feeds',
+            'rebuild_recommendations'
+        ):
+            call_command(command, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: {len(recipes)}'
+        ))
+
+    @staticmethod
+    def create_tags():
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        return list(Tag.objects.all())
+
+    @staticmethod
+    def create_users(options):
+        prefix, password = options['prefix'], make_password(PASSWORD)
+        return User.objects.bulk_create(
+            User(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                first_name='Пользователь',
+                last_name=str(number),
+                password=password
+            ) for number in range(options['users'])
+        )
+
+    @staticmethod
+    def placeholder_image():
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), '#E26C2D').save(buffer, 'JPEG')
+        return image_storage.save(
+            'recipes/placeholder.jpg', ContentFile(buffer.getvalue())
+        )
+
+    def create_recipes(self, rng, users, options):
+        image = self.placeholder_image()
+        authors = zipf_weights(len(users), options['exponent'])
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=rng.choices(users, cum_weights=authors)[0],
+                name=f'{options["prefix"]} рецепт {number}',
+                image=image,
+                text='Нарезать, смешать и приготовить. ' * rng.randint(1, 20),
+                cooking_time=rng.randint(5, 180)
+            ) for number in range(options['recipes'])
+        )
+        blob, _ = ImageBlob.objects.get_or_create(name=image)
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            refcount=F('refcount') + len(recipes)
+        )
+        return recipes
+
+    @staticmethod
+    def create_ingredients(rng, recipes, options):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        rng.shuffle(ingredients)
+        weights = zipf_weights(len(ingredients), options['exponent'])
+        IngredientInRecipe.objects.bulk_create((
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=rng.choice((1, 2, 5, 10, 50, 100, 200, 500))
+            )
+            for recipe in recipes
+            for ingredient_id in sample(
+                rng, ingredients, weights, max(2, int(rng.gauss(8, 3)))
+            )
+        ), batch_size=5000)
+
+    @staticmethod
+    def create_tag_links(rng, recipes, tags):
+        through = Recipe.tags.through
+        through.objects.bulk_create((
+            through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes
+            for tag in rng.sample(tags, rng.randint(1, 3))
+        ), batch_size=5000)
+
+    @staticmethod
+    def create_graphs(rng, users, recipes, options):
+        """Избранное и корзины идут через bulk_create менеджеров,
+        которые обновляют счётчики и списки покупок."""
+        popularity = list(recipes)
+        rng.shuffle(popularity)
+        recipe_weights = zipf_weights(len(popularity), options['exponent'])
+        author_weights = zipf_weights(len(users), options['exponent'])
+        favorites, carts, subscriptions = [], [], []
+        for user in users:
+            favorites.extend(
+                Favorite(user=user, recipe=recipe) for recipe in sample(
+                    rng, popularity, recipe_weights,
+                    int(rng.expovariate(1 / options['favorites']))
+                )
+            )
+            carts.extend(
+                ShoppingCart(user=user, recipe=recipe) for recipe in sample(
+                    rng, popularity, recipe_weights,
+                    int(rng.expovariate(1 / options['carts']))
+                )
+            )
+            subscriptions.extend(
+                Subscribe(user=user, author=author) for author in sample(
+                    rng, users, author_weights,
+                    int(rng.expovariate(1 / options['subscriptions']))
+                ) if author != user
+            )
+        Favorite.objects.bulk_create(favorites, batch_size=5000)
+        ShoppingCart.objects.bulk_create(carts, batch_size=5000)
+        Subscribe.objects.bulk_create(subscriptions, batch_size=5000)
@@ -0,0 +1,98 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import invalidate, is_shared
+from recipes.catalogue import READERS, clean
+from recipes.models import Ingredient
+
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает каталог ингредиентов из JSON (формат loaddata или '
+        'список объектов) или CSV с колонками name, measurement_unit. '
+        'Файл читается потоково, записи обновляются пачками по названию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу каталога')
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='Формат файла, по умолчанию — по расширению'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат: {file_format}')
+        if not is_shared():
+            raise CommandError(
+                'Кеш в памяти процесса: воркеры не узнают об импорте. '
+                'Укажите общий кеш в CACHE_BACKEND.'
+            )
+        totals = {'read': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+        started = time.perf_counter()
+        with open(path, encoding='utf-8', newline='') as stream:
+            rows = READERS[file_format](stream)
+            try:
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    self.load_batch(batch, totals)
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'{totals["read"]} строк, '
+                        f'{totals["read"] / elapsed:.0f} строк/с'
+                    )
+            except ValueError as error:
+                raise CommandError(f'Ошибка чтения {path}: {error}')
+        if totals['created'] or totals['updated']:
+            invalidate('ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            'Прочитано {read}, создано {created}, обновлено {updated}, '
+            'пропущено {skipped} за {elapsed:.1f} с'.format(
+                elapsed=time.perf_counter() - started, **totals
+            )
+        ))
+
+    @staticmethod
+    def load_batch(batch, totals):
+        totals['read'] += len(batch)
+        units = {}
+        for name, measurement_unit in batch:
+            name, measurement_unit = clean(name), clean(measurement_unit)
+            if (
+                not name
+                or len(name) > NAME_LENGTH
+                or len(measurement_unit) > UNIT_LENGTH
+            ):
+                totals['skipped'] += 1
+                continue
+            units[name] = measurement_unit
+        existing = dict(Ingredient.objects.filter(
+            name__in=units
+        ).values_list('name', 'measurement_unit'))
+        changed = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in units.items()
+            if existing.get(name) != measurement_unit
+        ]
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['measurement_unit']
+            )
+        updated = sum(1 for item in changed if item.name in existing)
+        totals['updated'] += updated
+        totals['created'] += len(changed) - updated
+        totals['skipped'] += len(units) - len(changed)
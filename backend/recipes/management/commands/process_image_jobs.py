@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.images import process_job
+from recipes.models import RecipeImageJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрабатывает задания картинок, оставшиеся в очереди: '
+        'например, после перезапуска сервера или ошибки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes', type=int, default=10,
+            help='Через сколько минут зависшее задание считается брошенным'
+        )
+
+    def handle(self, *args, **options):
+        stale = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        RecipeImageJob.objects.filter(
+            status=RecipeImageJob.PROCESSING, updated_at__lt=stale
+        ).update(status=RecipeImageJob.PENDING)
+        jobs = RecipeImageJob.objects.filter(
+            Q(status=RecipeImageJob.PENDING)
+            | Q(
+                status=RecipeImageJob.FAILED,
+                attempts__lt=settings.RECIPE_IMAGE_MAX_ATTEMPTS
+            )
+        ).order_by('id').values_list('id', flat=True)
+        done = failed = 0
+        for job_id in list(jobs):
+            try:
+                process_job(job_id)
+                done += 1
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Задание {job_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {done}, с ошибкой {failed}'
+        ))
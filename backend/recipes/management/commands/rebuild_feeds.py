@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново заполняет ленты подписок по таблице подписок. '
+        'С флагом --trim только обрезает ленты до FEED_MAX_LENGTH рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trim',
+            action='store_true',
+            help='Только обрезать ленты, не перестраивая их'
+        )
+
+    def handle(self, *args, **options):
+        if options['trim']:
+            trimmed = FeedEntry.objects.trim()
+            self.stdout.write(self.style.SUCCESS(
+                f'Удалено записей сверх {settings.FEED_MAX_LENGTH}: {trimmed}'
+            ))
+            return
+        with transaction.atomic():
+            FeedEntry.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {FeedEntry.objects.count()}'
+        ))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import NeighbourUpdate, RecipeNeighbour
+from recipes.recommendations import BACKENDS, DEFAULT_BACKEND
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по избранному и корзинам. '
+        'По умолчанию — все (например, раз в ночь); с флагом --stale — '
+        'только рецепты, у которых они менялись с прошлого пересчёта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Пересчитать только изменившиеся рецепты'
+        )
+        parser.add_argument(
+            '--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            if options['stale']:
+                rebuilt = RecipeNeighbour.objects.rebuild_stale(
+                    options['backend']
+                )
+            else:
+                NeighbourUpdate.objects.all().delete()
+                rebuilt = RecipeNeighbour.objects.rebuild(
+                    backend=options['backend']
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {rebuilt} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
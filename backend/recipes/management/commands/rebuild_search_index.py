@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает поисковые документы рецептов, например после '
+        'переименования ингредиентов.'
+    )
+
+    def handle(self, *args, **options):
+        count = 0
+        for recipe in Recipe.objects.iterator(chunk_size=500):
+            recipe.update_search_index()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс пересчитан: {count} рецептов'
+        ))
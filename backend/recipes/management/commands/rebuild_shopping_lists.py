@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import ShoppingCart, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает агрегированные списки покупок из корзин. '
+        'С флагом --verify только сообщает о расхождениях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Сравнить таблицу с корзинами, ничего не изменяя'
+        )
+
+    @staticmethod
+    def expected_items():
+        rows = (
+            ShoppingCart.objects
+            .filter(recipe__amount__isnull=False)
+            .values_list('user_id', 'recipe__amount__ingredient_id')
+            .annotate(total=Sum('recipe__amount__amount'))
+            .order_by()
+        )
+        return {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in rows.iterator()
+        }
+
+    def handle(self, *args, **options):
+        expected = self.expected_items()
+        if options['verify']:
+            actual = {
+                (user_id, ingredient_id): total
+                for user_id, ingredient_id, total in (
+                    ShoppingListItem.objects
+                    .values_list('user_id', 'ingredient_id', 'total_amount')
+                    .iterator()
+                )
+            }
+            mismatches = [
+                key for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            ]
+            for user_id, ingredient_id in sorted(mismatches):
+                self.stdout.write(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'ожидается {expected.get((user_id, ingredient_id))}, '
+                    f'в таблице {actual.get((user_id, ingredient_id))}'
+                )
+            if mismatches:
+                self.stderr.write(f'Расхождений: {len(mismatches)}')
+            else:
+                self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                [
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=total
+                    )
+                    for (user_id, ingredient_id), total in expected.items()
+                ],
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны: {len(expected)} позиций'
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
+
+from recipes.models import Favorite, Recipe, User
+from users.models import Subscribe
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscribe, 'author'),
+)
+TOUCHED = {'favorites_count': 'favorites_changed_at'}
+
+
+def actual_count(source, field):
+    return Coalesce(Subquery(
+        source.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики с исходными таблицами '
+        'и исправляет расхождения. С флагом --verify только сообщает о них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только посчитать расхождения, ничего не изменяя'
+        )
+
+    def handle(self, *args, **options):
+        for model, counter, source, field in COUNTERS:
+            drifted = model.objects.annotate(
+                actual=actual_count(source, field)
+            ).exclude(**{counter: F('actual')})
+            label = f'{model._meta.model_name}.{counter}'
+            if options['verify']:
+                self.stdout.write(f'{label}: расхождений {drifted.count()}')
+                continue
+            with transaction.atomic():
+                changes = {counter: actual_count(source, field)}
+                if counter in TOUCHED:
+                    changes[TOUCHED[counter]] = Now()
+                updated = model.objects.filter(
+                    pk__in=drifted.values('pk')
+                ).update(**changes)
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: исправлено {updated}'
+            ))
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+
+from recipes.search import recipe_document, recipe_tokens
+
+SEARCH_INDEX = GinIndex(
+    SearchVector('search_document', config='russian'),
+    name='recipe_search_document_gin'
+)
+
+
+def create_search_index(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeSearchToken = apps.get_model('recipes', 'RecipeSearchToken')
+    postgresql = schema_editor.connection.vendor == 'postgresql'
+    if postgresql:
+        schema_editor.add_index(Recipe, SEARCH_INDEX)
+    for recipe in Recipe.objects.prefetch_related('ingredients').iterator(
+        chunk_size=500
+    ):
+        ingredient_names = [
+            ingredient.name for ingredient in recipe.ingredients.all()
+        ]
+        Recipe.objects.filter(pk=recipe.pk).update(
+            search_document=recipe_document(
+                recipe.name, recipe.text, ingredient_names
+            )
+        )
+        if not postgresql:
+            RecipeSearchToken.objects.bulk_create([
+                RecipeSearchToken(recipe=recipe, token=token, weight=weight)
+                for token, weight in recipe_tokens(
+                    recipe.name, recipe.text, ingredient_names
+                ).items()
+            ])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(
+            apps.get_model('recipes', 'Recipe'), SEARCH_INDEX
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.CreateModel(
+            name='RecipeSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=200, verbose_name='Слово')),
+                ('weight', models.PositiveSmallIntegerField(verbose_name='Вес')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Слово рецепта',
+                'verbose_name_plural': 'Слова рецептов',
+                'indexes': [models.Index(fields=['token', 'recipe'], name='recipe_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
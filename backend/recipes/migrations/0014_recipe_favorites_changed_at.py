@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата изменения избранного'),
+        ),
+    ]
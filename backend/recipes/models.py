@@ -1,9 +1,23 @@
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from users.models import CounterFieldsMixin, Subscribe
+from .recommendations import DEFAULT_BACKEND, Interactions, similar_recipes
+from .search import recipe_document, recipe_tokens
+from .storage import image_storage
 
 User = get_user_model()
 
+FEED_BATCH_SIZE = 5000
+NEIGHBOURS_BATCH_SIZE = 5000
+
 
 class Tag(models.Model):
     name = models.CharField(
@@ -48,7 +62,7 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     tags = models.ManyToManyField(
         Tag,
         related_name='recipes',
@@ -71,21 +85,207 @@ class Recipe(models.Model):
         verbose_name='Название'
     )
     image = models.ImageField(upload_to='recipes/',
+                              storage=image_storage,
                               verbose_name='Ссылка на картинку')
     text = models.TextField(verbose_name='Описание')
     cooking_time = models.PositiveIntegerField(
         verbose_name='Время приготовления (минуты)',
         validators=[MinValueValidator(1, 'Не может быть меньше 1 минуты')]
     )
+    search_document = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Поисковый документ'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    favorites_changed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Дата изменения избранного'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии картинки'
+    )
+
+    counter_fields = ('favorites_count', 'favorites_changed_at')
+    worker_fields = ('image_variants',)
 
     class Meta:
         ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_idx'
+            )
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def update_search_index(self, ingredient_names=None):
+        """Пересчитывает поисковый документ по названию, описанию
+        и ингредиентам. Вызывается после сохранения ингредиентов;
+        уже известные названия ингредиентов можно передать."""
+        if ingredient_names is None:
+            ingredient_names = list(
+                self.ingredients.values_list('name', flat=True)
+            )
+        self.search_document = recipe_document(
+            self.name, self.text, ingredient_names
+        )
+        Recipe.objects.filter(pk=self.pk).update(
+            search_document=self.search_document
+        )
+        if connection.vendor == 'postgresql':
+            return
+        RecipeSearchToken.objects.filter(recipe=self).delete()
+        RecipeSearchToken.objects.bulk_create([
+            RecipeSearchToken(recipe=self, token=token, weight=weight)
+            for token, weight in recipe_tokens(
+                self.name, self.text, ingredient_names
+            ).items()
+        ])
+
+
+class RecipeImageJob(models.Model):
+    """Задание фоновой обработки картинки рецепта."""
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='image_jobs',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Обработка картинки'
+        verbose_name_plural = 'Обработка картинок'
+        indexes = [
+            models.Index(
+                fields=['status', 'id'], name='recipe_image_job_status_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'Картинка рецепта {self.recipe_id}: {self.status}'
+
+
+class ImageBlobManager(models.Manager):
+
+    def acquire(self, name):
+        blob, _ = self.get_or_create(name=name)
+        self.filter(pk=blob.pk).update(
+            refcount=models.F('refcount') + 1, updated_at=timezone.now()
+        )
+
+    def release(self, name):
+        self.filter(name=name, refcount__gt=0).update(
+            refcount=models.F('refcount') - 1, updated_at=timezone.now()
+        )
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище и число рецептов, которые на него
+    ссылаются. Файлы без ссылок удаляет команда collect_images."""
+
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Файл'
+    )
+    refcount = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ссылок'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    objects = ImageBlobManager()
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
+
+
+class RecipeSearchToken(models.Model):
+    """Инвертированный индекс рецептов для баз данных без
+    полнотекстового поиска. На PostgreSQL не заполняется."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='search_tokens',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE
+    )
+    token = models.CharField(max_length=200, verbose_name='Слово')
+    weight = models.PositiveSmallIntegerField(verbose_name='Вес')
+
+    class Meta:
+        verbose_name = 'Слово рецепта'
+        verbose_name_plural = 'Слова рецептов'
+        indexes = [
+            models.Index(
+                fields=['token', 'recipe'], name='recipe_search_token_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.token} ({self.weight})'
+
 
 class IngredientInRecipe(models.Model):
     ingredient = models.ForeignKey(
@@ -118,6 +318,51 @@ class IngredientInRecipe(models.Model):
         return f'Ингредиент {self.ingredient} рецепта {self.recipe.name}'
 
 
+class FavoriteQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Все переданные строки должны быть новыми,
+        иначе счётчик избранного увеличится повторно.
+        Пропуск конфликтов не поддерживается: Django возвращает
+        и не вставленные строки."""
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            raise ValueError('Пропуск конфликтов не поддерживается.')
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self.change_favorites_count(
+            Counter(obj.recipe_id for obj in objs), sign=1
+        )
+        User.touch_interactions({obj.user_id for obj in objs})
+        NeighbourUpdate.objects.mark({obj.recipe_id for obj in objs})
+        return objs
+
+    def delete(self):
+        """Удаляет одним запросом, без сигнала post_delete на каждую
+        строку: счётчики избранного уменьшаются пачкой."""
+        rows = list(self.values_list('user_id', 'recipe_id'))
+        deleted = self._raw_delete(self.db)
+        self.change_favorites_count(
+            Counter(recipe_id for _, recipe_id in rows), sign=-1
+        )
+        User.touch_interactions({user_id for user_id, _ in rows})
+        NeighbourUpdate.objects.mark({recipe_id for _, recipe_id in rows})
+        return deleted, {self.model._meta.label: deleted}
+
+    @staticmethod
+    def change_favorites_count(changes, sign):
+        """Один UPDATE на каждое встречающееся изменение счётчика."""
+        recipe_ids = defaultdict(list)
+        for recipe_id, count in changes.items():
+            recipe_ids[count].append(recipe_id)
+        for count, ids in recipe_ids.items():
+            recipes = Recipe.objects.filter(id__in=ids)
+            if sign < 0:
+                recipes = recipes.filter(favorites_count__gte=count)
+            recipes.update(
+                favorites_count=models.F('favorites_count') + sign * count,
+                favorites_changed_at=timezone.now()
+            )
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -132,6 +377,8 @@ class Favorite(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = FavoriteQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -145,6 +392,36 @@ class Favorite(models.Model):
         return f'Рецепт {self.recipe.name} в избранном у {self.user.name}'
 
 
+class ShoppingCartQuerySet(models.QuerySet):
+    """Корзина, синхронизирующая список покупок
+    при массовом добавлении и удалении."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Все переданные строки должны быть новыми,
+        иначе их количество учтётся в списке покупок повторно.
+        Пропуск конфликтов не поддерживается: Django возвращает
+        и не вставленные строки."""
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            raise ValueError('Пропуск конфликтов не поддерживается.')
+        objs = super().bulk_create(objs, *args, **kwargs)
+        ShoppingListItem.objects.add_pairs(
+            (obj.user_id, obj.recipe_id) for obj in objs
+        )
+        User.touch_interactions({obj.user_id for obj in objs})
+        NeighbourUpdate.objects.mark({obj.recipe_id for obj in objs})
+        return objs
+
+    def delete(self):
+        """Удаляет одним запросом, без сигнала post_delete на каждую
+        строку: список покупок пересчитывается пачкой."""
+        rows = list(self.values_list('user_id', 'recipe_id'))
+        ShoppingListItem.objects.remove_pairs(rows)
+        deleted = self._raw_delete(self.db)
+        User.touch_interactions({user_id for user_id, _ in rows})
+        NeighbourUpdate.objects.mark({recipe_id for _, recipe_id in rows})
+        return deleted, {self.model._meta.label: deleted}
+
+
 class ShoppingCart(models.Model):
     user = models.ForeignKey(
         User,
@@ -159,6 +436,8 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = ShoppingCartQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
@@ -170,3 +449,429 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'Рецепт {self.recipe.name} в списке покупок {self.user.name}'
+
+    def delete(self, *args, **kwargs):
+        ShoppingListItem.objects.remove_pairs([(self.user_id, self.recipe_id)])
+        return super().delete(*args, **kwargs)
+
+
+class ShoppingListItemManager(models.Manager):
+    """Менеджер, поддерживающий агрегированный список покупок
+    в актуальном состоянии при изменении корзины и рецептов."""
+
+    def apply_deltas(self, deltas):
+        """Прибавляет изменения из словаря
+        {(id пользователя, id ингредиента): изменение}."""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        with transaction.atomic():
+            user_ids, ingredient_ids = zip(*deltas)
+            existing = {
+                (item.user_id, item.ingredient_id): item
+                for item in self.select_for_update().filter(
+                    user_id__in=set(user_ids),
+                    ingredient_id__in=set(ingredient_ids)
+                )
+            }
+            to_create, to_update, to_delete = [], [], []
+            for (user_id, ingredient_id), delta in deltas.items():
+                item = existing.get((user_id, ingredient_id))
+                if item is None:
+                    if delta > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=delta
+                        ))
+                    continue
+                item.total_amount += delta
+                if item.total_amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.id)
+            self.bulk_create(to_create)
+            self.bulk_update(to_update, ['total_amount'])
+            if to_delete:
+                self.filter(id__in=to_delete).delete()
+
+    @staticmethod
+    def pair_amounts(pairs, sign=1):
+        """Считает изменения для пар (id пользователя, id рецепта)."""
+        pairs = list(pairs)
+        recipe_amounts = defaultdict(list)
+        for recipe_id, ingredient_id, amount in (
+            IngredientInRecipe.objects
+            .filter(recipe_id__in={recipe_id for _, recipe_id in pairs})
+            .values_list('recipe_id', 'ingredient_id', 'amount')
+        ):
+            recipe_amounts[recipe_id].append((ingredient_id, amount))
+        deltas = defaultdict(int)
+        for user_id, recipe_id in pairs:
+            for ingredient_id, amount in recipe_amounts[recipe_id]:
+                deltas[user_id, ingredient_id] += sign * amount
+        return deltas
+
+    def add_pairs(self, pairs):
+        pairs = list(pairs)
+        if pairs:
+            self.apply_deltas(self.pair_amounts(pairs))
+
+    def apply_recipe_changes(self, recipe_id, changes):
+        """Переносит изменения ингредиентов рецепта
+        {id ингредиента: изменение количества} в списки покупок
+        пользователей, у которых рецепт в корзине."""
+        changes = {key: delta for key, delta in changes.items() if delta}
+        if not changes:
+            return
+        self.apply_deltas({
+            (user_id, ingredient_id): delta
+            for user_id in ShoppingCart.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('user_id', flat=True)
+            for ingredient_id, delta in changes.items()
+        })
+
+    def remove_pairs(self, pairs):
+        pairs = list(pairs)
+        if pairs:
+            self.apply_deltas(self.pair_amounts(pairs, sign=-1))
+
+
+class ShoppingListItem(models.Model):
+    """Денормализованный список покупок: суммарное количество
+    ингредиента по всем рецептам в корзине пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        related_name='shopping_list',
+        verbose_name='Покупатель',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_ingredient_in_shopping_list')
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.total_amount} у {self.user}'
+
+
+class FeedEntryManager(models.Manager):
+    """Ленты подписок. Рецепт автора, у которого подписчиков не больше
+    FEED_PUSH_MAX_FOLLOWERS, при создании записывается в ленты всех
+    подписчиков; рецепты более популярных авторов подмешиваются
+    при чтении ленты."""
+
+    @staticmethod
+    def is_pushed(author):
+        return author.followers_count <= settings.FEED_PUSH_MAX_FOLLOWERS
+
+    def fan_out(self, recipe):
+        """Добавляет новый рецепт в ленты подписчиков автора."""
+        if not self.is_pushed(recipe.author):
+            return
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, recipe_id=recipe.id)
+                for user_id in Subscribe.objects.filter(
+                    author_id=recipe.author_id
+                ).values_list('user_id', flat=True)
+            ],
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+    def backfill(self, user_id, author):
+        """Добавляет в ленту последние рецепты автора после подписки."""
+        if not self.is_pushed(author):
+            return
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in self.latest_recipes(author.id)
+            ],
+            ignore_conflicts=True
+        )
+        self.trim([user_id])
+
+    def backfill_followers(self, author_id):
+        """Добавляет последние рецепты автора в ленты всех подписчиков.
+        Нужно, когда автор снова рассылает рецепты: опубликованные,
+        пока его рецепты подмешивались при чтении, в ленты не попали."""
+        recipe_ids = self.latest_recipes(author_id)
+        user_ids = list(Subscribe.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True))
+        self.bulk_create(
+            (
+                self.model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in recipe_ids
+            ),
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        self.trim(user_ids)
+
+    def remove(self, user_id, author_id):
+        """Убирает из ленты рецепты автора после отписки."""
+        self.filter(user_id=user_id, recipe__author_id=author_id).delete()
+
+    def trim(self, user_ids=None):
+        """Оставляет в лентах по FEED_MAX_LENGTH последних рецептов.
+        Возвращает число удалённых записей."""
+        last_kept = self.filter(
+            user_id=models.OuterRef('user_id')
+        ).order_by('-recipe_id').values('recipe_id')[
+            settings.FEED_MAX_LENGTH - 1:settings.FEED_MAX_LENGTH
+        ]
+        entries = self.filter(recipe_id__lt=models.Subquery(last_kept))
+        if user_ids is not None:
+            entries = entries.filter(user_id__in=user_ids)
+        return entries.delete()[0]
+
+    def rebuild(self):
+        """Заново заполняет ленты по всем подпискам."""
+        self.all().delete()
+        followers = defaultdict(list)
+        for user_id, author_id in Subscribe.objects.filter(
+            author__followers_count__lte=settings.FEED_PUSH_MAX_FOLLOWERS
+        ).values_list('user_id', 'author_id').iterator():
+            followers[author_id].append(user_id)
+        entries = []
+        for author_id, user_ids in followers.items():
+            recipe_ids = self.latest_recipes(author_id)
+            for user_id in user_ids:
+                entries.extend(
+                    self.model(user_id=user_id, recipe_id=recipe_id)
+                    for recipe_id in recipe_ids
+                )
+                if len(entries) >= FEED_BATCH_SIZE:
+                    self.bulk_create(entries)
+                    entries = []
+        self.bulk_create(entries)
+        self.trim()
+
+    @staticmethod
+    def latest_recipes(author_id):
+        return list(
+            Recipe.objects
+            .filter(author_id=author_id)
+            .order_by('-id')
+            .values_list('id', flat=True)[:settings.FEED_MAX_LENGTH]
+        )
+
+    def recipe_ids(self, user, limit, before=None, after=None, recipes=None):
+        """id рецептов ленты: не больше limit id меньше before по убыванию
+        или, если передан after, больше after по возрастанию.
+
+        Два запроса с фильтрами запроса (queryset recipes) внутри:
+        рецепты из записей ленты — по индексу (user, recipe_id),
+        рецепты популярных авторов — по индексу (author, id), не старше
+        FEED_MAX_LENGTH их последних рецептов. Списки сливаются в памяти."""
+        recipes = Recipe.objects.all() if recipes is None else recipes
+        descending = after is None
+        if before is not None:
+            recipes = recipes.filter(id__lt=before)
+        if after is not None:
+            recipes = recipes.filter(id__gt=after)
+        recipes = recipes.order_by('-id' if descending else 'id')
+        pulled = list(Subscribe.objects.filter(
+            user=user,
+            author__followers_count__gt=settings.FEED_PUSH_MAX_FOLLOWERS
+        ).values_list('author_id', flat=True))
+        ids = set(recipes.filter(
+            feed_entries__user=user
+        ).values_list('id', flat=True)[:limit])
+        if pulled:
+            oldest = Recipe.objects.filter(
+                author_id__in=pulled
+            ).order_by('-id').values('id')[
+                settings.FEED_MAX_LENGTH - 1:settings.FEED_MAX_LENGTH
+            ]
+            ids.update(recipes.filter(
+                author_id__in=pulled,
+                id__gte=Coalesce(models.Subquery(oldest), 0)
+            ).values_list('id', flat=True)[:limit])
+        return sorted(ids, reverse=descending)[:limit]
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        related_name='feed',
+        verbose_name='Читатель',
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE
+    )
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_recipe_in_feed')
+        ]
+
+    def __str__(self):
+        return f'Рецепт {self.recipe_id} в ленте {self.user_id}'
+
+
+class RecipeNeighbourManager(models.Manager):
+    """Похожие рецепты, посчитанные по совместной встречаемости
+    в избранном и корзинах (recipes.recommendations)."""
+
+    @staticmethod
+    def interactions():
+        return Interactions(chain(
+            Favorite.objects.values_list('user_id', 'recipe_id').iterator(),
+            ShoppingCart.objects.values_list(
+                'user_id', 'recipe_id'
+            ).iterator()
+        ))
+
+    def rebuild(self, recipe_ids=None, backend=DEFAULT_BACKEND, matrix=None):
+        """Пересчитывает соседей рецептов recipe_ids, по умолчанию всех.
+        Возвращает число пересчитанных рецептов."""
+        if matrix is None:
+            matrix = self.interactions()
+        neighbours = self.all()
+        if recipe_ids is not None:
+            neighbours = neighbours.filter(recipe_id__in=recipe_ids)
+        neighbours.delete()
+        rebuilt, rows = 0, []
+        for recipe_id, similar in similar_recipes(
+            matrix, settings.RECOMMENDATION_NEIGHBOURS, recipe_ids, backend
+        ):
+            rebuilt += 1
+            rows.extend(
+                self.model(
+                    recipe_id=recipe_id, neighbour_id=neighbour_id,
+                    score=score
+                ) for neighbour_id, score in similar
+            )
+            if len(rows) >= NEIGHBOURS_BATCH_SIZE:
+                self.bulk_create(rows)
+                rows = []
+        self.bulk_create(rows)
+        return rebuilt
+
+    def rebuild_stale(self, backend=DEFAULT_BACKEND):
+        """Пересчитывает соседей после изменений избранного и корзин.
+
+        Когда пользователь добавляет или убирает рецепт, меняется число
+        выбравших его, а значит, и сходство с ним любого рецепта. Поэтому
+        пересчитываются сами изменившиеся рецепты, рецепты, которые сейчас
+        выбраны вместе с ними, и рецепты, у которых они были в соседях
+        (среди них те, что выбирались вместе только раньше)."""
+        changed = list(
+            NeighbourUpdate.objects.values_list('recipe_id', flat=True)
+        )
+        if not changed:
+            return 0
+        NeighbourUpdate.objects.filter(recipe_id__in=changed).delete()
+        matrix = self.interactions()
+        stale = matrix.related(changed).union(
+            changed,
+            self.filter(neighbour_id__in=changed).values_list(
+                'recipe_id', flat=True
+            )
+        )
+        return self.rebuild(stale, backend, matrix)
+
+    def recommend(self, queryset, user):
+        """Рецепты, похожие на избранное и корзину пользователя,
+        кроме них самих, по убыванию суммарного сходства."""
+        favorites = Favorite.objects.filter(user=user).values('recipe_id')
+        purchases = ShoppingCart.objects.filter(user=user).values('recipe_id')
+        return queryset.filter(
+            models.Q(neighbour_of__recipe__in=favorites)
+            | models.Q(neighbour_of__recipe__in=purchases)
+        ).exclude(id__in=favorites).exclude(id__in=purchases).annotate(
+            recommendation=models.Sum('neighbour_of__score')
+        ).order_by('-recommendation', '-id')
+
+
+class RecipeNeighbour(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='neighbours',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE
+    )
+    neighbour = models.ForeignKey(
+        Recipe,
+        related_name='neighbour_of',
+        verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    objects = RecipeNeighbourManager()
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbour'],
+                name='unique_recipe_neighbour')
+        ]
+
+    def __str__(self):
+        return f'{self.neighbour_id} похож на {self.recipe_id}: {self.score}'
+
+
+class NeighbourUpdateManager(models.Manager):
+
+    def mark(self, recipe_ids):
+        self.bulk_create(
+            [self.model(recipe_id=recipe_id) for recipe_id in recipe_ids],
+            ignore_conflicts=True
+        )
+
+
+class NeighbourUpdate(models.Model):
+    """Рецепт, похожие на который нужно пересчитать. Без внешнего ключа:
+    отметка ставится и при удалении избранного вместе с рецептом."""
+
+    recipe_id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name='id рецепта'
+    )
+
+    objects = NeighbourUpdateManager()
+
+    class Meta:
+        verbose_name = 'Рецепт для пересчёта похожих'
+        verbose_name_plural = 'Рецепты для пересчёта похожих'
+
+    def __str__(self):
+        return str(self.recipe_id)
@@ -0,0 +1,154 @@
+"""Похожие рецепты по совместной встречаемости в избранном и корзинах.
+
+X — матрица пользователи × рецепты: X[u, r] = 1, если рецепт r у
+пользователя u в избранном или в корзине. C = XᵀX — сколько пользователей
+выбрали оба рецепта, сходство рецептов — C[i, j] / sqrt(C[i, i] · C[j, j]).
+Строки C считаются блоками через SciPy, если он установлен,
+иначе построчно на чистом Python по тем же массивам CSR."""
+import heapq
+from array import array
+from collections import Counter
+from itertools import chain
+from math import sqrt
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
+
+BLOCK_SIZE = 1000
+
+
+def to_csr(keys, width):
+    """Отсортированные без повторов ключи row * width + column →
+    (indptr, indices) для матрицы из max(row) + 1 строк."""
+    indices, indptr = array('q'), array('q', [0])
+    for key in keys:
+        row, column = divmod(key, width)
+        while len(indptr) <= row:
+            indptr.append(len(indices))
+        indices.append(column)
+    indptr.append(len(indices))
+    return indptr, indices
+
+
+class Interactions:
+    """Матрица X и транспонированная к ней, обе в формате CSR.
+    Пары (пользователь, рецепт) могут повторяться."""
+
+    def __init__(self, pairs):
+        users, recipes = {}, {}
+        user_rows, recipe_rows = array('q'), array('q')
+        for user_id, recipe_id in pairs:
+            user_rows.append(users.setdefault(user_id, len(users)))
+            recipe_rows.append(recipes.setdefault(recipe_id, len(recipes)))
+        self.recipe_ids = list(recipes)
+        self.recipe_index = recipes
+        self.shape = (len(users), len(recipes))
+        self.user_ptr, self.user_items = to_csr(sorted(set(
+            user * len(recipes) + recipe
+            for user, recipe in zip(user_rows, recipe_rows)
+        )), len(recipes))
+        self.recipe_ptr, self.recipe_users = to_csr(sorted(set(
+            recipe * len(users) + user
+            for user, recipe in zip(user_rows, recipe_rows)
+        )), len(users))
+        self.degrees = [
+            end - start
+            for start, end in zip(self.recipe_ptr, self.recipe_ptr[1:])
+        ]
+
+    def __len__(self):
+        return len(self.user_items)
+
+    def rows(self, recipe_ids=None):
+        """Индексы рецептов, для которых считаются соседи."""
+        if recipe_ids is None:
+            return range(self.shape[1])
+        return sorted(
+            self.recipe_index[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in self.recipe_index
+        )
+
+    def related(self, recipe_ids):
+        """id рецептов, которые выбрал хотя бы один пользователь,
+        выбравший какой-нибудь из recipe_ids."""
+        users = set()
+        for row in self.rows(recipe_ids):
+            users.update(self.recipe_users[
+                self.recipe_ptr[row]:self.recipe_ptr[row + 1]
+            ])
+        rows = set()
+        for user in users:
+            rows.update(self.user_items[
+                self.user_ptr[user]:self.user_ptr[user + 1]
+            ])
+        return {self.recipe_ids[row] for row in rows}
+
+
+def python_neighbours(matrix, rows, k):
+    ptr, items = matrix.user_ptr, matrix.user_items
+    users, degrees = matrix.recipe_users, matrix.degrees
+    for row in rows:
+        start, end = matrix.recipe_ptr[row], matrix.recipe_ptr[row + 1]
+        counts = Counter(chain.from_iterable(
+            items[ptr[user]:ptr[user + 1]] for user in users[start:end]
+        ))
+        del counts[row]
+        best = heapq.nlargest(
+            k, counts.items(),
+            key=lambda item: item[1] / sqrt(degrees[item[0]])
+        )
+        yield row, [
+            (column, count / sqrt(degrees[row] * degrees[column]))
+            for column, count in best
+        ]
+
+
+def scipy_neighbours(matrix, rows, k):
+    ones = numpy.ones(len(matrix), dtype=numpy.float32)
+    users = sparse.csr_matrix(
+        (ones, numpy.frombuffer(matrix.user_items, dtype=numpy.int64),
+         numpy.frombuffer(matrix.user_ptr, dtype=numpy.int64)),
+        shape=matrix.shape
+    )
+    recipes = users.T.tocsr()
+    norms = numpy.sqrt(numpy.asarray(matrix.degrees, dtype=numpy.float32))
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        counts = (recipes[block] @ users).tocsr()
+        for position, row in enumerate(block):
+            begin, end = counts.indptr[position], counts.indptr[position + 1]
+            columns = counts.indices[begin:end]
+            scores = counts.data[begin:end] / (norms[row] * norms[columns])
+            scores[columns == row] = 0
+            if len(scores) > k:
+                top = numpy.argpartition(-scores, k)[:k]
+            else:
+                top = numpy.arange(len(scores))
+            top = top[numpy.argsort(-scores[top], kind='stable')]
+            yield int(row), [
+                (int(columns[index]), float(scores[index]))
+                for index in top if scores[index] > 0
+            ]
+
+
+BACKENDS = {'python': python_neighbours}
+if sparse is not None:
+    BACKENDS['scipy'] = scipy_neighbours
+DEFAULT_BACKEND = 'scipy' if sparse is not None else 'python'
+
+
+def similar_recipes(matrix, k, recipe_ids=None, backend=DEFAULT_BACKEND):
+    """Для каждого рецепта из recipe_ids (по умолчанию всех) —
+    пары (id рецепта, [(id соседа, сходство), ...]), не больше k
+    соседей по убыванию сходства."""
+    for row, neighbours in BACKENDS[backend](
+        matrix, matrix.rows(recipe_ids), k
+    ):
+        yield matrix.recipe_ids[row], [
+            (matrix.recipe_ids[column], score)
+            for column, score in neighbours
+        ]
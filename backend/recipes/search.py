@@ -0,0 +1,34 @@
+import re
+
+SPACES = re.compile(r'\s+')
+WORDS = re.compile(r'\w+')
+
+NAME_WEIGHT = 3
+INGREDIENT_WEIGHT = 2
+TEXT_WEIGHT = 1
+
+
+def normalize(value):
+    return SPACES.sub(' ', value.lower().replace('ё', 'е')).strip()
+
+
+def tokenize(value):
+    return WORDS.findall(normalize(value))
+
+
+def recipe_document(name, text, ingredient_names):
+    """Текст, по которому ищутся рецепты."""
+    return normalize(' '.join([name, *ingredient_names, text]))
+
+
+def recipe_tokens(name, text, ingredient_names):
+    """Словарь {слово: вес} для инвертированного индекса."""
+    tokens = {}
+    for value, weight in (
+        (text, TEXT_WEIGHT),
+        (' '.join(ingredient_names), INGREDIENT_WEIGHT),
+        (name, NAME_WEIGHT),
+    ):
+        for token in tokenize(value):
+            tokens[token] = max(tokens.get(token, 0), weight)
+    return tokens
@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import Subscribe
+from .images import delete_stale_variants
+from .models import (
+    Favorite, FeedEntry, ImageBlob, NeighbourUpdate, Recipe, ShoppingCart,
+    ShoppingListItem, User
+)
+
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_pairs(
+            [(instance.user_id, instance.recipe_id)]
+        )
+        User.touch_interactions([instance.user_id])
+        NeighbourUpdate.objects.mark([instance.recipe_id])
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def touch_shopping_cart_owner(sender, instance, **kwargs):
+    User.touch_interactions([instance.user_id])
+    NeighbourUpdate.objects.mark([instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    ShoppingListItem.objects.remove_pairs(
+        ShoppingCart.objects.filter(
+            recipe=instance
+        ).values_list('user_id', 'recipe_id')
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def increase_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(id=instance.recipe_id).update(
+            favorites_count=F('favorites_count') + 1,
+            favorites_changed_at=timezone.now()
+        )
+        User.touch_interactions([instance.user_id])
+        NeighbourUpdate.objects.mark([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Favorite)
+def decrease_favorites_count(sender, instance, **kwargs):
+    Recipe.objects.filter(
+        id=instance.recipe_id, favorites_count__gt=0
+    ).update(
+        favorites_count=F('favorites_count') - 1,
+        favorites_changed_at=timezone.now()
+    )
+    User.touch_interactions([instance.user_id])
+    NeighbourUpdate.objects.mark([instance.recipe_id])
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(id=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    User.objects.filter(
+        id=instance.author_id, recipes_count__gt=0
+    ).update(recipes_count=F('recipes_count') - 1)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_previous_image(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    instance._previous_image = Recipe.objects.filter(
+        pk=instance.pk
+    ).values_list('image', flat=True).first() if instance.pk else ''
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_references(sender, instance, **kwargs):
+    previous = instance.__dict__.pop('_previous_image', None)
+    if previous is None or previous == instance.image.name:
+        return
+    if instance.image.name:
+        ImageBlob.objects.acquire(instance.image.name)
+    if previous:
+        ImageBlob.objects.release(previous)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image(sender, instance, **kwargs):
+    if instance.image.name:
+        ImageBlob.objects.release(instance.image.name)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(sender, instance, **kwargs):
+    recipe_id = instance.id
+    transaction.on_commit(
+        lambda: delete_stale_variants(recipe_id, keep=set())
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(sender, instance, update_fields, **kwargs):
+    if not instance.pk or update_fields is not None and not set(
+        update_fields
+    ) & set(AUTHOR_FIELDS):
+        return
+    instance._previous_author_fields = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, **kwargs):
+    """Данные автора входят в ответы по рецептам: при их изменении
+    меняется дата изменения рецептов, а с ней и ETag."""
+    previous = instance.__dict__.pop('_previous_author_fields', None)
+    if previous is None or previous == tuple(
+        getattr(instance, field) for field in AUTHOR_FIELDS
+    ):
+        return
+    Recipe.objects.filter(author_id=instance.pk).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.fan_out(instance)
+
+
+@receiver(post_save, sender=Subscribe)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.backfill(instance.user_id, instance.author)
+
+
+@receiver(post_delete, sender=Subscribe)
+def clean_feed(sender, instance, **kwargs):
+    FeedEntry.objects.remove(instance.user_id, instance.author_id)
+    # Счётчик подписчиков уже уменьшен обработчиком приложения users:
+    # ровно на пороге автор только что вернулся к рассылке.
+    if User.objects.filter(
+        id=instance.author_id,
+        followers_count=settings.FEED_PUSH_MAX_FOLLOWERS
+    ).exists():
+        FeedEntry.objects.backfill_followers(instance.author_id)
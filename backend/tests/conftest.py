@@ -0,0 +1,63 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.search import ingredient_index, recipe_ingredient_index
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAA'
+    'AADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+def reset_caches():
+    cache.clear()
+    ingredient_index.invalidate()
+    recipe_ingredient_index.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(settings, tmp_path):
+    """Картинки пишутся во временный каталог, кеш у тестов свой,
+    PDF рисуется шрифтом из reportlab, а исключения в представлениях
+    не превращаются в ответ 200."""
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.SHOPPING_CART_PDF_FONT = 'Vera.ttf'
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tests',
+        }
+    }
+    settings.MIDDLEWARE = [
+        middleware for middleware in settings.MIDDLEWARE
+        if middleware != 'foodgram.middleware.Process500'
+    ]
+    reset_caches()
+
+
+@pytest.fixture
+def clear_caches():
+    """Сбрасывает кеш ответов и индексы в памяти процесса."""
+    return reset_caches
+
+
+@pytest.fixture
+def image():
+    """Картинка 1×1 в base64 для создания рецептов."""
+    return PNG
+
+
+@pytest.fixture
+def make_client():
+    """Клиент API с токеном пользователя, без пользователя — анонимный."""
+
+    def make(user=None):
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    return make
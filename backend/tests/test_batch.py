@@ -0,0 +1,63 @@
+import pytest
+
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
+    ShoppingListItem, User
+)
+
+
+@pytest.fixture
+def buyer():
+    return User.objects.create_user(
+        username='buyer', email='buyer@example.com', password='password'
+    )
+
+
+@pytest.fixture
+def recipes(buyer):
+    flour = Ingredient.objects.create(name='Мука', measurement_unit='г')
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=buyer, name=f'Рецепт {number}', image='recipes/batch.png',
+            text='Описание', cooking_time=10
+        )
+        for number in range(3)
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=flour, amount=100)
+        for recipe in recipes
+    )
+    return recipes
+
+
+@pytest.mark.django_db
+def test_repeated_batch_does_not_add_amounts_twice(
+    recipes, buyer, make_client
+):
+    client = make_client(buyer)
+    url = '/api/recipes/shopping_cart/batch/'
+    first = client.post(
+        url, {'recipes': [recipe.id for recipe in recipes[:2]]},
+        format='json'
+    )
+    second = client.post(
+        url, {'recipes': [recipe.id for recipe in recipes]}, format='json'
+    )
+    assert first.status_code == second.status_code == 200
+    assert [result['status'] for result in second.data] == [
+        'exists', 'exists', 'created'
+    ]
+    assert ShoppingListItem.objects.get(user=buyer).total_amount == 300
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model', (Favorite, ShoppingCart))
+def test_bulk_create_refuses_to_ignore_conflicts(recipes, buyer, model):
+    model.objects.create(user=buyer, recipe=recipes[0])
+    with pytest.raises(ValueError):
+        model.objects.bulk_create(
+            [model(user=buyer, recipe=recipes[0])], ignore_conflicts=True
+        )
+    assert Recipe.objects.get(id=recipes[0].id).favorites_count == (
+        1 if model is Favorite else 0
+    )
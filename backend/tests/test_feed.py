@@ -0,0 +1,138 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import FeedEntry, Recipe, Tag, User
+from users.models import Subscribe
+
+
+@pytest.fixture
+def reader():
+    return User.objects.create_user(
+        username='reader', email='reader@example.com', password='password'
+    )
+
+
+@pytest.fixture
+def tag():
+    return Tag.objects.create(
+        name='Завтрак', color='#000001', slug='breakfast'
+    )
+
+
+@pytest.fixture
+def authors(reader, settings):
+    """Два автора с лентами на записи и два популярных, чьи рецепты
+    подмешиваются при чтении; на последнего читатель не подписан."""
+    settings.FEED_PUSH_MAX_FOLLOWERS = 1
+    authors = [
+        User.objects.create_user(
+            username=f'author{number}', email=f'author{number}@example.com'
+        )
+        for number in range(5)
+    ]
+    fan = User.objects.create_user(username='fan', email='fan@example.com')
+    for author in authors[2:4]:
+        Subscribe.objects.create(user=fan, author=author)
+    for author in authors[:4]:
+        Subscribe.objects.create(user=reader, author=author)
+    for author in authors:
+        author.refresh_from_db()
+    return authors
+
+
+@pytest.fixture
+def recipes(authors, tag):
+    recipes = []
+    for number in range(40):
+        recipe = Recipe.objects.create(
+            author=authors[number * 7 % len(authors)],
+            name=f'Рецепт {number}', image='recipes/feed.png',
+            text='Описание', cooking_time=10
+        )
+        if number % 3 == 0:
+            recipe.tags.add(tag)
+        recipes.append(recipe)
+    return recipes
+
+
+def walk(client, url, link):
+    """Страницы по ссылкам link и ссылка назад с последней из них."""
+    pages, back = [], {'next': 'previous', 'previous': 'next'}[link]
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append([recipe['id'] for recipe in response.data['results']])
+        url, returned = response.data[link], response.data[back]
+    return pages, returned
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query', ('', '&tags=breakfast'))
+def test_feed_pages_match_subscriptions(
+    recipes, authors, reader, query, make_client
+):
+    expected = list(Recipe.objects.filter(
+        author__in=authors[:4],
+        **({'tags__slug': 'breakfast'} if query else {})
+    ).order_by('-id').values_list('id', flat=True))
+    client = make_client(reader)
+    forward, previous = walk(
+        client, f'/api/recipes/feed/?recipes_limit=4{query}', 'next'
+    )
+    assert sum(forward, []) == expected
+    assert all(len(page) == 4 for page in forward[:-1])
+    backward, _ = walk(client, previous, 'previous')
+    assert backward == forward[-2::-1]
+
+
+@pytest.mark.django_db
+def test_feed_query_count_does_not_depend_on_filter(
+    recipes, reader, make_client
+):
+    """Фильтр, под который подходит только самый старый рецепт,
+    не заставляет дочитывать ленту по частям."""
+    rare = Tag.objects.create(name='Редкое', color='#000002', slug='rare')
+    recipes[0].tags.add(rare)
+    client = make_client(reader)
+    counts = {}
+    for query in ('&tags=breakfast', '&tags=rare'):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/recipes/feed/?recipes_limit=1{query}')
+        assert response.status_code == 200
+        assert len(response.data['results']) == 1
+        counts[query] = len(queries)
+    assert response.data['results'][0]['id'] == recipes[0].id
+    assert len(set(counts.values())) == 1, counts
+
+
+@pytest.mark.django_db
+def test_pulled_authors_are_capped_by_feed_length(
+    recipes, authors, reader, make_client, settings
+):
+    settings.FEED_MAX_LENGTH = 5
+    pulled = Recipe.objects.filter(
+        author__in=authors[2:4]
+    ).order_by('-id').values_list('id', flat=True)
+    forward, _ = walk(
+        make_client(reader), '/api/recipes/feed/?recipes_limit=50', 'next'
+    )
+    assert set(pulled) & set(sum(forward, [])) == set(pulled[:5])
+
+
+@pytest.mark.django_db
+def test_author_back_to_push_mode_is_backfilled(
+    recipes, authors, reader, make_client
+):
+    """Рецепты, опубликованные в режиме чтения, остаются в ленте,
+    когда автор возвращается к рассылке."""
+    popular = authors[2]
+    Subscribe.objects.get(user__username='fan', author=popular).delete()
+    popular.refresh_from_db()
+    assert FeedEntry.objects.is_pushed(popular)
+    forward, _ = walk(
+        make_client(reader), '/api/recipes/feed/?recipes_limit=50', 'next'
+    )
+    assert set(Recipe.objects.filter(
+        author=popular
+    ).values_list('id', flat=True)) <= set(sum(forward, []))
@@ -0,0 +1,61 @@
+import base64
+import struct
+import zlib
+
+import pytest
+
+from recipes.models import User
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack(
+        '>I', zlib.crc32(kind + data)
+    )
+
+
+def png_header(width, height):
+    """PNG из одних заголовков, без данных пикселей."""
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(
+        b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    ) + png_chunk(b'IEND', b'')
+
+
+@pytest.fixture
+def author():
+    return User.objects.create_user(
+        username='author', email='author@example.com', password='password'
+    )
+
+
+def recipe_body(image):
+    return {
+        'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+        'image': image, 'tags': [], 'ingredients': [],
+    }
+
+
+@pytest.mark.django_db
+def test_decompression_bomb_header_is_rejected(author, make_client):
+    image = 'data:image/png;base64,' + base64.b64encode(
+        png_header(20000, 10000)
+    ).decode()
+    response = make_client(author).post(
+        '/api/recipes/', recipe_body(image), format='json'
+    )
+    assert response.status_code == 400
+    assert 'пикселей' in str(response.data['image'])
+
+
+@pytest.mark.django_db
+def test_oversized_body_is_refused_before_parsing(
+    author, make_client, settings, monkeypatch
+):
+    settings.RECIPE_REQUEST_MAX_SIZE = 1000
+    monkeypatch.setattr(
+        'rest_framework.parsers.JSONParser.parse',
+        lambda *args, **kwargs: pytest.fail('Тело не должно разбираться')
+    )
+    response = make_client(author).post(
+        '/api/recipes/', recipe_body('A' * 5000), format='json'
+    )
+    assert response.status_code == 413
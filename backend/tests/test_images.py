@@ -0,0 +1,93 @@
+import base64
+from io import StringIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from recipes import images
+from recipes.models import Recipe, RecipeImageJob, User
+
+
+def stored_variants(recipe_id):
+    directory = f'recipes/variants/{recipe_id}'
+    if not default_storage.exists(directory):
+        return []
+    return default_storage.listdir(directory)[1]
+
+
+@pytest.fixture
+def recipe(image):
+    author = User.objects.create_user(
+        username='author', email='author@example.com', password='password'
+    )
+    return Recipe.objects.create(
+        author=author, name='Рецепт', text='Описание', cooking_time=10,
+        image=ContentFile(
+            base64.b64decode(image.partition(',')[2]), name='photo.png'
+        )
+    )
+
+
+@pytest.fixture
+def processed(recipe):
+    images.process_job(images.schedule_image_processing(recipe).id)
+    recipe.refresh_from_db()
+    assert recipe.image_variants
+    return recipe
+
+
+@pytest.mark.django_db
+def test_recipe_delete_removes_variants(
+    processed, django_capture_on_commit_callbacks
+):
+    assert stored_variants(processed.id)
+    recipe_id = processed.id
+    with django_capture_on_commit_callbacks(execute=True):
+        processed.delete()
+    assert stored_variants(recipe_id) == []
+
+
+@pytest.mark.django_db
+def test_full_save_keeps_variants_written_by_worker(recipe):
+    job = images.schedule_image_processing(recipe)
+    stale = Recipe.objects.get(id=recipe.id)
+    images.process_job(job.id)
+    stale.name = 'Новое название'
+    stale.save()
+    saved = Recipe.objects.get(id=recipe.id)
+    assert saved.name == 'Новое название'
+    assert saved.image_variants
+
+
+@pytest.mark.django_db
+def test_job_of_deleted_recipe_leaves_no_variants(recipe, monkeypatch):
+    job = images.schedule_image_processing(recipe)
+    render = images.render_variants
+
+    def render_and_delete(recipe, prefix):
+        Recipe.objects.filter(id=recipe.id).delete()
+        return render(recipe, prefix)
+
+    monkeypatch.setattr(images, 'render_variants', render_and_delete)
+    images.process_job(job.id)
+    assert stored_variants(recipe.id) == []
+    assert not RecipeImageJob.objects.exists()
+
+
+@pytest.mark.django_db
+def test_collect_images_removes_unreferenced_variants(processed):
+    """Копии удалённого рецепта и старые копии живого — мусор."""
+    kept = set(images.variant_names(processed.image_variants))
+    strays = [
+        default_storage.save(name, ContentFile(b'stale'))
+        for name in (
+            f'recipes/variants/{processed.id}/0-320.webp',
+            f'recipes/variants/{processed.id + 1}/1-320.webp',
+        )
+    ]
+    call_command('collect_images', grace_minutes=-1, stdout=StringIO())
+    assert not any(default_storage.exists(name) for name in strays)
+    assert all(default_storage.exists(name) for name in kept)
+    assert default_storage.exists(processed.image.name)
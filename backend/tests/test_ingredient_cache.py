@@ -0,0 +1,89 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+
+from api.cache import invalidate, version_key
+from api.checks import shared_cache_check
+from api.search import ingredient_index
+from recipes.models import Ingredient
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path, clear_caches):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'cache'),
+        }
+    }
+    clear_caches()
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(json.dumps([
+        {'name': 'Шафран', 'measurement_unit': 'г'},
+    ]), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.django_db
+def test_import_reaches_cached_responses_and_index(
+    shared_cache, catalogue, make_client
+):
+    """Импорт идёт в другом процессе: сброс доходит до кешированных
+    ответов и индекса названий только через версию в общем кеше."""
+    Ingredient.objects.create(name='Шалфей', measurement_unit='г')
+    client = make_client()
+    url = '/api/ingredients/?search=ша'
+    assert len(client.get(url).json()) == 1
+    call_command('load_ingredients', catalogue, stdout=StringIO())
+    response = client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert {item['name'] for item in response.json()} == {'Шалфей', 'Шафран'}
+
+
+@pytest.mark.django_db
+def test_index_follows_version_bumped_elsewhere(shared_cache):
+    ingredient_index.search('ша')
+    added = Ingredient.objects.bulk_create([
+        Ingredient(name='Шафран', measurement_unit='г')
+    ])
+    invalidate('ingredients')
+    assert ingredient_index.search('ша') == [added[0].id]
+
+
+@pytest.mark.django_db
+def test_evicted_version_does_not_revive_stale_responses(
+    shared_cache, make_client
+):
+    """Версия вытеснена из кеша вместе с частью ответов: новая версия
+    не должна совпасть с версией уцелевших старых ответов."""
+    client = make_client()
+    url = '/api/ingredients/?search=ша'
+    assert client.get(url).json() == []
+    Ingredient.objects.bulk_create([
+        Ingredient(name='Шафран', measurement_unit='г')
+    ])
+    invalidate('ingredients')
+    cache.delete(version_key('ingredients'))
+    response = client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert [item['name'] for item in response.json()] == ['Шафран']
+
+
+@pytest.mark.django_db
+def test_import_requires_shared_cache(catalogue):
+    with pytest.raises(CommandError):
+        call_command('load_ingredients', catalogue)
+    assert not Ingredient.objects.exists()
+
+
+def test_check_warns_about_process_local_cache():
+    assert [warning.id for warning in shared_cache_check(None)] == [
+        'api.W001'
+    ]
@@ -0,0 +1,263 @@
+"""Число SQL-запросов каждого эндпоинта API не зависит от размера
+страницы и объёма связанных данных."""
+from collections import Counter, namedtuple
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.metrics import fingerprint
+from recipes.models import (
+    Favorite, FeedEntry, Ingredient, IngredientInRecipe, Recipe,
+    RecipeNeighbour, ShoppingCart, Tag, User
+)
+from users.models import Subscribe
+
+SIZES = (1, 10, 50)
+
+Endpoint = namedtuple(
+    'Endpoint', 'name anonymous method url body status'
+)
+
+
+def build_dataset(size):
+    """size авторов по size рецептов, в каждом до 10 ингредиентов
+    и до 3 тегов; ещё один ингредиент ни в одном рецепте не используется,
+    чтобы изменение рецепта всегда и добавляло, и меняло строки.
+    Пользователь me подписан на всех авторов и держит
+    size рецептов в избранном и в корзине. На автора stranger он
+    не подписан, его рецептов нет ни в избранном, ни в корзине.
+    stranger и первый автор добавили в избранное рецепт recipe
+    и последний из избранного me: при любом size они самые похожие.
+    Наборы разных размеров не пересекаются и живут в одной базе."""
+    me = User.objects.create_user(
+        username=f'me{size}', email=f'me{size}@example.com',
+        password='me-password'
+    )
+    authors = User.objects.bulk_create(
+        User(
+            username=f'author{size}-{number}',
+            email=f'author{size}-{number}@example.com'
+        )
+        for number in range(size + 1)
+    )
+    stranger = authors.pop()
+    tags = Tag.objects.bulk_create(
+        Tag(
+            name=f'Тег {size}-{number}',
+            color=f'#{size:03X}{number:03X}',
+            slug=f'tag{size}-{number}'
+        )
+        for number in range(size)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'соль {size}-{number}', measurement_unit='г')
+        for number in range(size + 1)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {author.id}-{number}',
+            image='recipes/check.png',
+            text='Описание',
+            cooking_time=10
+        )
+        for author in [me, stranger] + authors
+        for number in range(size)
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes
+        for ingredient in ingredients[:min(size, 10)]
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in tags[:3]
+    )
+    Subscribe.objects.bulk_create(
+        Subscribe(user=me, author=author) for author in authors
+    )
+    Favorite.objects.bulk_create(
+        [Favorite(user=me, recipe=recipe) for recipe in recipes[-size:]]
+        + [
+            Favorite(user=user, recipe=recipe)
+            for user in (stranger, authors[0])
+            for recipe in (recipes[-1], recipes[size])
+        ]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=me, recipe=recipe) for recipe in recipes[-size:]
+    )
+    return {
+        'size': size,
+        'me': me,
+        'author': authors[0].id,
+        'stranger': stranger.id,
+        'recipe': recipes[size].id,
+        'favorite': recipes[-1].id,
+        'own_recipe': recipes[0].id,
+        'recipes': [recipe.id for recipe in recipes[-size:]],
+        'tag': tags[0].id,
+        'tag_slug': tags[0].slug,
+        'ingredient': ingredients[0].id,
+        'ingredients': [ingredient.id for ingredient in ingredients],
+        'tags': [tag.id for tag in tags[:3]],
+    }
+
+
+def recipe_body(name):
+    def body(data, image):
+        return {
+            'name': f'{name} {data["size"]}',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': image,
+            'tags': data['tags'],
+            'ingredients': [
+                {'id': ingredient, 'amount': 2}
+                for ingredient in data['ingredients']
+            ],
+        }
+    return body
+
+
+def batch_body(data, image):
+    return {'recipes': data['recipes']}
+
+
+def match_body(data, image):
+    return {'ingredients': data['ingredients'][:3], 'tags': data['tags']}
+
+
+ENDPOINTS = (
+    Endpoint('users', True, 'get', '/api/users/?recipes_limit={size}',
+             None, 200),
+    Endpoint('user', True, 'get', '/api/users/{author}/', None, 200),
+    Endpoint('me', False, 'get', '/api/users/me/', None, 200),
+    Endpoint('subscriptions', False, 'get',
+             '/api/users/subscriptions/?recipes_limit={size}', None, 200),
+    Endpoint('subscribe', False, 'post',
+             '/api/users/{stranger}/subscribe/?recipes_limit={size}',
+             None, 201),
+    Endpoint('tags', True, 'get', '/api/tags/', None, 200),
+    Endpoint('tag', True, 'get', '/api/tags/{tag}/', None, 200),
+    Endpoint('ingredients', True, 'get', '/api/ingredients/?name=сол',
+             None, 200),
+    Endpoint('ingredient', True, 'get', '/api/ingredients/{ingredient}/',
+             None, 200),
+    *(
+        Endpoint(f'recipes{query}', True, 'get',
+                 f'/api/recipes/?recipes_limit={{size}}{query}', None, 200)
+        for query in (
+            '', '&is_favorited=1', '&is_in_shopping_cart=1',
+            '&tags={tag_slug}', '&author={author}', '&ordering=popular',
+            '&cursor=',
+        )
+    ),
+    Endpoint('recipe', True, 'get', '/api/recipes/{recipe}/', None, 200),
+    *(
+        Endpoint(f'by_ingredients{query}', True, 'post',
+                 f'/api/recipes/by_ingredients/?recipes_limit={{size}}{query}',
+                 match_body, 200)
+        for query in ('', '&cursor=')
+    ),
+    Endpoint('similar', True, 'get',
+             '/api/recipes/{favorite}/similar/?recipes_limit={size}',
+             None, 200),
+    Endpoint('recommended', False, 'get',
+             '/api/recipes/recommended/?recipes_limit={size}', None, 200),
+    Endpoint('feed', False, 'get', '/api/recipes/feed/?recipes_limit={size}',
+             None, 200),
+    Endpoint('create_recipe', False, 'post', '/api/recipes/',
+             recipe_body('Новый рецепт'), 201),
+    Endpoint('update_recipe', False, 'patch', '/api/recipes/{own_recipe}/',
+             recipe_body('Изменённый рецепт'), 200),
+    Endpoint('delete_recipe', False, 'delete', '/api/recipes/{own_recipe}/',
+             None, 204),
+    *(
+        endpoint
+        for name in ('favorite', 'shopping_cart')
+        for endpoint in (
+            Endpoint(name, False, 'post', f'/api/recipes/{{recipe}}/{name}/',
+                     None, 201),
+            Endpoint(f'delete_{name}', False, 'delete',
+                     f'/api/recipes/{{favorite}}/{name}/', None, 204),
+            Endpoint(f'{name}_batch', False, 'post',
+                     f'/api/recipes/{name}/batch/', batch_body, 200),
+            Endpoint(f'delete_{name}_batch', False, 'delete',
+                     f'/api/recipes/{name}/batch/', batch_body, 200),
+        )
+    ),
+    *(
+        Endpoint(f'download_shopping_cart_{format}', False, 'get',
+                 f'/api/recipes/download_shopping_cart/?format={format}',
+                 None, 200)
+        for format in ('txt', 'pdf')
+    ),
+)
+CASES = [
+    pytest.param(
+        endpoint, anonymous,
+        id=f'{endpoint.name}-{"anonymous" if anonymous else "user"}'
+    )
+    for endpoint in ENDPOINTS
+    for anonymous in ((False, True) if endpoint.anonymous else (False,))
+]
+
+
+@pytest.fixture(scope='module')
+def datasets(django_db_setup, django_db_blocker):
+    """Наборы данных всех размеров, общие для тестов модуля
+    и откатываемые после них."""
+    with django_db_blocker.unblock(), transaction.atomic():
+        datasets = {size: build_dataset(size) for size in SIZES}
+        FeedEntry.objects.rebuild()
+        RecipeNeighbour.objects.rebuild()
+        yield datasets
+        transaction.set_rollback(True)
+
+
+def describe(measurements):
+    """Число запросов по размерам и отпечатки запросов,
+    добавившихся на самом большом наборе."""
+    counts = ', '.join(
+        f'{size}: {len(queries)}' for size, queries in measurements.items()
+    )
+    grown = Counter(map(fingerprint, measurements[SIZES[-1]])) - Counter(
+        map(fingerprint, measurements[SIZES[0]])
+    )
+    return '\n'.join([f'запросов по размерам {counts}'] + [
+        f'  +{count} {sql[:300]}' for sql, count in grown.most_common()
+    ])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('endpoint, anonymous', CASES)
+def test_query_count_is_constant(
+    datasets, endpoint, anonymous, make_client, clear_caches, image
+):
+    measurements = {}
+    for size, data in datasets.items():
+        client = make_client(None if anonymous else data['me'])
+        url = endpoint.url.format(**data)
+        body = endpoint.body(data, image) if endpoint.body else None
+        clear_caches()
+        send = getattr(client, endpoint.method)
+        # Откат после каждого запроса: иначе картинка, сохранённая
+        # на первом наборе, на следующих уже есть и запросов меньше.
+        with transaction.atomic(), CaptureQueriesContext(
+            connection
+        ) as queries:
+            response = send(url) if body is None else send(
+                url, body, format='json'
+            )
+            content = b''.join(response)
+            transaction.set_rollback(True)
+        assert response.status_code == endpoint.status, (
+            f'{url}: {response.status_code} {content[:300]!r}'
+        )
+        measurements[size] = [query['sql'] for query in queries]
+    assert len({len(queries) for queries in measurements.values()}) == 1, (
+        describe(measurements)
+    )
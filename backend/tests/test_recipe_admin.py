@@ -0,0 +1,65 @@
+import pytest
+
+from recipes.models import (
+    Ingredient, IngredientInRecipe, Recipe, ShoppingCart, ShoppingListItem,
+    Tag, User
+)
+
+
+@pytest.fixture
+def admin_client(client):
+    client.force_login(User.objects.create_superuser(
+        username='admin', email='admin@example.com', password='password'
+    ))
+    return client
+
+
+@pytest.mark.django_db
+def test_inline_changes_reach_shopping_lists(admin_client):
+    author = User.objects.create_user(
+        username='author', email='author@example.com', password='password'
+    )
+    tag = Tag.objects.create(name='Обед', color='#000001', slug='lunch')
+    flour, sugar, salt = Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г')
+        for name in ('Мука', 'Сахар', 'Соль')
+    )
+    recipe = Recipe.objects.create(
+        author=author, name='Пирог', image='recipes/admin.png',
+        text='Описание', cooking_time=40
+    )
+    recipe.tags.add(tag)
+    items = IngredientInRecipe.objects.bulk_create([
+        IngredientInRecipe(recipe=recipe, ingredient=flour, amount=100),
+        IngredientInRecipe(recipe=recipe, ingredient=sugar, amount=50),
+    ])
+    ShoppingCart.objects.create(user=author, recipe=recipe)
+    response = admin_client.post(
+        f'/admin/recipes/recipe/{recipe.id}/change/', {
+            'author': author.id,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [tag.id],
+            'amount-TOTAL_FORMS': 3,
+            'amount-INITIAL_FORMS': 2,
+            'amount-MIN_NUM_FORMS': 0,
+            'amount-MAX_NUM_FORMS': 1000,
+            'amount-0-id': items[0].id,
+            'amount-0-recipe': recipe.id,
+            'amount-0-ingredient': flour.id,
+            'amount-0-amount': 150,
+            'amount-1-id': items[1].id,
+            'amount-1-recipe': recipe.id,
+            'amount-1-ingredient': sugar.id,
+            'amount-1-amount': 50,
+            'amount-1-DELETE': 'on',
+            'amount-2-recipe': recipe.id,
+            'amount-2-ingredient': salt.id,
+            'amount-2-amount': 5,
+        }
+    )
+    assert response.status_code == 302
+    assert dict(ShoppingListItem.objects.filter(user=author).values_list(
+        'ingredient_id', 'total_amount'
+    )) == {flour.id: 150, salt.id: 5}
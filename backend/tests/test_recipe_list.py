@@ -0,0 +1,152 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag, User
+)
+from users.models import Subscribe
+
+PAGE_SIZES = (1, 50)
+
+
+@pytest.fixture
+def reader():
+    return User.objects.create_user(
+        username='reader', email='reader@example.com', password='password'
+    )
+
+
+@pytest.fixture
+def recipes(reader):
+    """50 рецептов разных авторов, у каждого по 3 тега и ингредиента;
+    читатель подписан на половину авторов, половина рецептов у него
+    в избранном и в корзине."""
+    authors = User.objects.bulk_create(
+        User(username=f'author{number}', email=f'author{number}@example.com')
+        for number in range(max(PAGE_SIZES))
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color=f'#00000{number}', slug=f'tag{number}')
+        for number in range(3)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'Мука {number}', measurement_unit='г')
+        for number in range(3)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author, name=f'Рецепт {author.username}',
+            image='recipes/list.png', text='Описание', cooking_time=10
+        )
+        for author in authors
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=100)
+        for recipe in recipes
+        for ingredient in ingredients
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in tags
+    )
+    Subscribe.objects.bulk_create(
+        Subscribe(user=reader, author=author) for author in authors[::2]
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=reader, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=reader, recipe=recipe) for recipe in recipes[::2]
+    )
+    return recipes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('anonymous', (True, False), ids=('anonymous', 'user'))
+def test_recipe_list_query_count_does_not_depend_on_page_size(
+    recipes, reader, anonymous, make_client, clear_caches
+):
+    client = make_client(None if anonymous else reader)
+    counts = {}
+    for page_size in PAGE_SIZES:
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/recipes/?recipes_limit={page_size}')
+        assert response.status_code == 200
+        assert len(response.data['results']) == page_size
+        counts[page_size] = len(queries)
+    assert counts[1] == counts[50], counts
+
+
+@pytest.mark.django_db
+def test_recipe_list_flags_come_from_annotations(recipes, reader, make_client):
+    response = make_client(reader).get(
+        f'/api/recipes/?recipes_limit={len(recipes)}'
+    )
+    results = {recipe['id']: recipe for recipe in response.data['results']}
+    for position, recipe in enumerate(recipes):
+        flagged = position % 2 == 0
+        assert results[recipe.id]['is_favorited'] is flagged
+        assert results[recipe.id]['is_in_shopping_cart'] is flagged
+        assert results[recipe.id]['author']['is_subscribed'] is flagged
+        assert len(results[recipe.id]['tags']) == 3
+        assert len(results[recipe.id]['ingredients']) == 3
+
+
+@pytest.mark.django_db
+def test_popular_order_etag_changes_with_favorites(recipes, make_client):
+    """Рецепт выходит в лидеры по избранному другого пользователя."""
+    client = make_client()
+    url = '/api/recipes/?ordering=popular&recipes_limit=1'
+    first = client.get(url)
+    assert first.data['results'][0]['id'] != recipes[0].id
+    Favorite.objects.create(user=recipes[1].author, recipe=recipes[0])
+    second = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert second.status_code == 200
+    assert second.data['results'][0]['id'] == recipes[0].id
+    assert client.get(
+        url, HTTP_IF_NONE_MATCH=second['ETag']
+    ).status_code == 304
+
+
+@pytest.mark.django_db
+def test_keyset_list_skips_count(recipes, make_client):
+    with CaptureQueriesContext(connection) as queries:
+        response = make_client().get('/api/recipes/?cursor=')
+    assert response.status_code == 200
+    assert 'ETag' not in response
+    assert not any('COUNT(' in query['sql'] for query in queries)
+
+
+@pytest.mark.django_db
+def test_popular_order_etag_changes_when_favorite_moves(
+    recipes, make_client
+):
+    """Сумма счётчиков не меняется, а порядок — меняется."""
+    client = make_client()
+    url = '/api/recipes/?ordering=popular&recipes_limit=1'
+    fan = recipes[1].author
+    Favorite.objects.create(user=fan, recipe=recipes[0])
+    first = client.get(url)
+    assert first.data['results'][0]['id'] == recipes[0].id
+    Favorite.objects.get(user=fan, recipe=recipes[0]).delete()
+    Favorite.objects.create(user=fan, recipe=recipes[2])
+    second = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert second.status_code == 200
+    assert second.data['results'][0]['id'] == recipes[2].id
+
+
+@pytest.mark.django_db
+def test_author_profile_change_invalidates_etags(recipes, make_client):
+    client = make_client()
+    author = recipes[0].author
+    urls = ('/api/recipes/', f'/api/recipes/{recipes[0].id}/')
+    etags = {url: client.get(url)['ETag'] for url in urls}
+    author.first_name = 'Новое имя'
+    author.save()
+    for url in urls:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+        assert response.status_code == 200
+    assert response.data['author']['first_name'] == 'Новое имя'
@@ -0,0 +1,136 @@
+import random
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.search import recipe_ingredient_index
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag, User
+
+
+@pytest.fixture
+def catalogue():
+    """Ингредиенты с большими id, как у каталога после импорта."""
+    return Ingredient.objects.bulk_create(
+        Ingredient(id=200_000 + number, name=f'Специя {number}',
+                   measurement_unit='г')
+        for number in range(30)
+    )
+
+
+@pytest.fixture
+def tags():
+    return Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color=f'#00000{number}', slug=f'tag{number}')
+        for number in range(3)
+    )
+
+
+@pytest.fixture
+def recipes(catalogue, tags):
+    rng = random.Random(0)
+    author = User.objects.create_user(
+        username='author', email='author@example.com', password='password'
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author, name=f'Рецепт {number}', image='recipes/match.png',
+            text='Описание', cooking_time=rng.randint(5, 60)
+        )
+        for number in range(60)
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes
+        for ingredient in rng.sample(catalogue, rng.randint(1, 8))
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in rng.sample(tags, rng.randint(0, 2))
+    )
+    return recipes
+
+
+def brute_force(available, tag_ids=(), max_cooking_time=None,
+                max_missing=None):
+    matches = []
+    for recipe in Recipe.objects.prefetch_related('tags', 'amount'):
+        ingredients = {item.ingredient_id for item in recipe.amount.all()}
+        matched = len(ingredients & set(available))
+        missing = len(ingredients) - matched
+        if (
+            not matched
+            or tag_ids and not {tag.id for tag in recipe.tags.all()}
+            & set(tag_ids)
+            or max_cooking_time and recipe.cooking_time > max_cooking_time
+            or max_missing is not None and missing > max_missing
+        ):
+            continue
+        matches.append((recipe.id, missing, matched))
+    return sorted(matches, key=lambda match: (
+        match[1], -match[2] / (match[1] + match[2]), -match[0]
+    ))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('seed', range(5))
+def test_match_agrees_with_brute_force(recipes, catalogue, tags, seed):
+    rng = random.Random(seed)
+    available = [
+        ingredient.id for ingredient in rng.sample(catalogue, 6)
+    ] + [10 ** 9]
+    tag_ids = [tag.id for tag in rng.sample(tags, rng.randint(0, 2))]
+    options = {
+        'max_cooking_time': rng.choice((None, 30)),
+        'max_missing': rng.choice((None, 0, 2)),
+    }
+    assert recipe_ingredient_index.match(
+        available, tag_ids=tag_ids, **options
+    ) == brute_force(available, tag_ids, **options)
+
+
+@pytest.mark.django_db
+def test_index_follows_recipe_changes(
+    recipes, catalogue, django_capture_on_commit_callbacks
+):
+    available = [ingredient.id for ingredient in catalogue[:10]]
+    recipe_ingredient_index.match(available)
+    changed, deleted = recipes[:2]
+    with django_capture_on_commit_callbacks(execute=True):
+        IngredientInRecipe.objects.filter(recipe=changed).delete()
+        IngredientInRecipe.objects.create(
+            recipe=changed, ingredient=catalogue[0], amount=1
+        )
+        changed.save()
+        deleted.delete()
+    matches = recipe_ingredient_index.match(available)
+    assert (changed.id, 0, 1) in matches
+    assert deleted.id not in {recipe_id for recipe_id, _, _ in matches}
+    assert matches == brute_force(available)
+
+
+@pytest.mark.django_db
+def test_by_ingredients_ignores_cursor(recipes, catalogue, make_client):
+    response = make_client().post(
+        '/api/recipes/by_ingredients/?cursor=&recipes_limit=5',
+        {'ingredients': [ingredient.id for ingredient in catalogue[:5]]},
+        format='json'
+    )
+    assert response.status_code == 200
+    assert len(response.data['results']) == 5
+    assert response.data['count'] == len(brute_force(
+        [ingredient.id for ingredient in catalogue[:5]]
+    ))
+
+
+@pytest.mark.django_db
+def test_too_many_ingredients_rejected_before_lookup(make_client):
+    with CaptureQueriesContext(connection) as queries:
+        response = make_client().post(
+            '/api/recipes/by_ingredients/',
+            {'ingredients': list(range(1, 102))}, format='json'
+        )
+    assert response.status_code == 400
+    assert not any('SELECT' in query['sql'] for query in queries)
+    assert response.data['ingredients'] == ['Не больше 100 элементов.']
@@ -0,0 +1,126 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, Recipe, Tag, User
+
+SIZES = (1, 20)
+
+
+@pytest.fixture
+def author():
+    return User.objects.create_user(
+        username='author', email='author@example.com', password='password'
+    )
+
+
+@pytest.fixture
+def tags():
+    return Tag.objects.bulk_create(
+        Tag(
+            name=f'Тег {number}', color=f'#0000{number:02}',
+            slug=f'tag{number}'
+        )
+        for number in range(max(SIZES))
+    )
+
+
+@pytest.fixture
+def ingredients():
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'Крупа {number}', measurement_unit='г')
+        for number in range(2 * max(SIZES))
+    )
+
+
+def recipe_body(name, image, tags, ingredients, amount=10):
+    return {
+        'name': name,
+        'text': 'Описание',
+        'cooking_time': 15,
+        'image': image,
+        'tags': [tag.id for tag in tags],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient in ingredients
+        ],
+    }
+
+
+def count_queries(send, *args):
+    """Ответ и число запросов. Изменения откатываются: сохранённая
+    картинка иначе уже была бы в базе при следующем вызове."""
+    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+        response = send(*args, format='json')
+        transaction.set_rollback(True)
+    return response, len(queries)
+
+
+@pytest.mark.django_db
+def test_create_query_count_does_not_depend_on_tags_and_ingredients(
+    author, tags, ingredients, image, make_client
+):
+    client = make_client(author)
+    counts = {}
+    for size in SIZES:
+        response, counts[size] = count_queries(
+            client.post, '/api/recipes/', recipe_body(
+                f'Рецепт {size}', image, tags[:size], ingredients[:size]
+            )
+        )
+        assert response.status_code == 201, response.data
+        assert len(response.data['ingredients']) == size
+        assert len(response.data['tags']) == size
+    assert counts[SIZES[0]] == counts[SIZES[-1]], counts
+
+
+@pytest.mark.django_db
+def test_update_query_count_does_not_depend_on_tags_and_ingredients(
+    author, tags, ingredients, image, make_client
+):
+    """Обновление и добавляет, и меняет, и удаляет ингредиенты."""
+    client = make_client(author)
+    counts = {}
+    for size in SIZES:
+        recipe = client.post('/api/recipes/', recipe_body(
+            f'Рецепт {size}', image, tags[:size], ingredients[:size]
+        ), format='json').data
+        response, counts[size] = count_queries(
+            client.patch, f'/api/recipes/{recipe["id"]}/', recipe_body(
+                f'Новый рецепт {size}', image, tags[-size:],
+                ingredients[size // 2:size // 2 + size], amount=20
+            )
+        )
+        assert response.status_code == 200, response.data
+        assert sorted(
+            item['id'] for item in response.data['ingredients']
+        ) == [
+            ingredient.id
+            for ingredient in ingredients[size // 2:size // 2 + size]
+        ]
+        assert {item['amount'] for item in response.data['ingredients']} == {
+            20
+        }
+    assert counts[SIZES[0]] == counts[SIZES[-1]], counts
+
+
+@pytest.mark.django_db
+def test_missing_ids_are_reported_together(
+    author, tags, ingredients, image, make_client
+):
+    client = make_client(author)
+    counts = {}
+    for size in SIZES:
+        missing = list(range(10_000, 10_000 + size))
+        body = recipe_body(f'Рецепт {size}', image, tags[:1], ingredients[:1])
+        body['tags'] = missing
+        body['ingredients'] = [{'id': pk, 'amount': 1} for pk in missing]
+        response, counts[size] = count_queries(
+            client.post, '/api/recipes/', body
+        )
+        assert response.status_code == 400
+        for field in ('tags', 'ingredients'):
+            message = str(response.data[field][0])
+            assert all(str(pk) in message for pk in missing), message
+    assert counts[SIZES[0]] == counts[SIZES[-1]], counts
+    assert not Recipe.objects.exists()
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from recipes.models import (
+    Favorite, NeighbourUpdate, Recipe, RecipeNeighbour, ShoppingCart, User
+)
+
+
+@pytest.fixture
+def users():
+    return User.objects.bulk_create(
+        User(username=f'user{number}', email=f'user{number}@example.com')
+        for number in range(12)
+    )
+
+
+@pytest.fixture
+def recipes(users):
+    return Recipe.objects.bulk_create(
+        Recipe(
+            author=users[0], name=f'Рецепт {number}',
+            image='recipes/similar.png', text='Описание', cooking_time=10
+        )
+        for number in range(20)
+    )
+
+
+def neighbours():
+    return {
+        (recipe_id, neighbour_id): round(score, 6)
+        for recipe_id, neighbour_id, score in
+        RecipeNeighbour.objects.values_list(
+            'recipe_id', 'neighbour_id', 'score'
+        )
+    }
+
+
+def full_rebuild():
+    NeighbourUpdate.objects.all().delete()
+    RecipeNeighbour.objects.rebuild(backend='python')
+    return neighbours()
+
+
+@pytest.mark.django_db
+def test_incremental_rebuild_updates_every_affected_recipe(users, recipes):
+    first, second, *_ = users
+    a, b, c, *_ = recipes
+    Favorite.objects.create(user=first, recipe=a)
+    Favorite.objects.create(user=first, recipe=b)
+    Favorite.objects.create(user=second, recipe=c)
+    full_rebuild()
+    Favorite.objects.create(user=second, recipe=b)
+    RecipeNeighbour.objects.rebuild_stale(backend='python')
+    incremental = neighbours()
+    assert incremental[a.id, b.id] == pytest.approx(0.707107)
+    assert incremental[c.id, b.id] == pytest.approx(0.707107)
+    assert incremental == full_rebuild()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('limit', (2, 20))
+def test_incremental_rebuild_matches_full_rebuild(
+    users, recipes, seed, limit, settings
+):
+    """Случайные добавления и удаления, по одной строке и пачками."""
+    settings.RECOMMENDATION_NEIGHBOURS = limit
+    rng = random.Random(seed)
+    pairs = {
+        (user.id, recipe.id)
+        for user in users
+        for recipe in rng.sample(recipes, rng.randint(1, 6))
+    }
+    Favorite.objects.bulk_create(
+        Favorite(user_id=user_id, recipe_id=recipe_id)
+        for user_id, recipe_id in pairs
+    )
+    full_rebuild()
+    for _ in range(3):
+        for _ in range(4):
+            user, recipe = rng.choice(users), rng.choice(recipes)
+            model = rng.choice((Favorite, ShoppingCart))
+            existing = model.objects.filter(user=user, recipe=recipe)
+            if existing.exists():
+                existing.get().delete()
+            else:
+                model.objects.create(user=user, recipe=recipe)
+        user = rng.choice(users)
+        Favorite.objects.filter(user=user).delete()
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe)
+            for recipe in rng.sample(recipes, 3)
+            if not ShoppingCart.objects.filter(
+                user=user, recipe=recipe
+            ).exists()
+        )
+        RecipeNeighbour.objects.rebuild_stale(backend='python')
+        incremental = neighbours()
+        assert incremental == full_rebuild()
@@ -0,0 +1,43 @@
+import pytest
+
+from recipes.models import Ingredient, ShoppingListItem, User
+
+
+@pytest.fixture
+def buyer():
+    buyer = User.objects.create_user(
+        username='buyer', email='buyer@example.com', password='password'
+    )
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(user=buyer, ingredient=ingredient, total_amount=10)
+        for ingredient in Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number:03}', measurement_unit='г')
+            for number in range(100)
+        )
+    )
+    return buyer
+
+
+@pytest.mark.django_db
+def test_shopping_cart_downloads_as_pdf(buyer, make_client):
+    response = make_client(buyer).get(
+        '/api/recipes/download_shopping_cart/?format=pdf'
+    )
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'application/pdf'
+    assert response['Content-Disposition'] == (
+        'attachment; filename=Purchases.pdf'
+    )
+    content = b''.join(response.streaming_content)
+    assert content.startswith(b'%PDF-')
+    assert content.rstrip().endswith(b'%%EOF')
+    assert content.count(b'/Type /Page\n') == 3
+
+
+@pytest.mark.django_db
+def test_pdf_download_requires_authentication(make_client):
+    response = make_client().get(
+        '/api/recipes/download_shopping_cart/?format=pdf'
+    )
+    assert response.status_code == 401
@@ -6,7 +6,10 @@ from .models import CustomUser, Subscribe
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'email', 'username', 'first_name', 'last_name')
+    list_display = (
+        'id', 'email', 'username', 'first_name', 'last_name',
+        'recipes_count', 'followers_count'
+    )
     list_filter = ('email', 'first_name')
 
 
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='interactions_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия избранного, покупок и подписок'),
+        ),
+    ]
@@ -2,12 +2,30 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.db.models import (
-    CASCADE, CharField, CheckConstraint, EmailField, F, ForeignKey, Model, Q,
-    UniqueConstraint
+    CASCADE, CharField, CheckConstraint, EmailField, F, ForeignKey, Index,
+    Model, PositiveIntegerField, Q, UniqueConstraint
 )
 
 
-class CustomUser(AbstractUser):
+class CounterFieldsMixin:
+    """Не перезаписывает денормализованные счётчики при сохранении
+    существующего объекта: они меняются только через F()-обновления.
+    Так же не перезаписываются поля, которые пишет фоновый обработчик."""
+
+    counter_fields = ()
+    worker_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = {*self.counter_fields, *self.worker_fields}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
     email = EmailField(
         verbose_name='Электронная почта', max_length=254, unique=True)
     username = CharField(
@@ -22,6 +40,17 @@ class CustomUser(AbstractUser):
     first_name = CharField(verbose_name='Имя', max_length=150)
     last_name = CharField(verbose_name='Фамилия', max_length=150)
     password = CharField(verbose_name='Пароль', max_length=150)
+    recipes_count = PositiveIntegerField(
+        verbose_name='Рецептов', default=0, editable=False)
+    followers_count = PositiveIntegerField(
+        verbose_name='Подписчиков', default=0, editable=False)
+    interactions_version = PositiveIntegerField(
+        verbose_name='Версия избранного, покупок и подписок',
+        default=0, editable=False)
+
+    counter_fields = (
+        'recipes_count', 'followers_count', 'interactions_version'
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
@@ -33,6 +62,13 @@ class CustomUser(AbstractUser):
     def __str__(self) -> str:
         return self.email
 
+    @classmethod
+    def touch_interactions(cls, user_ids):
+        """Меняет версию избранного, покупок и подписок пользователей."""
+        cls.objects.filter(id__in=user_ids).update(
+            interactions_version=F('interactions_version') + 1
+        )
+
 
 class Subscribe(Model):
     User = get_user_model()
@@ -58,6 +94,9 @@ class Subscribe(Model):
             CheckConstraint(
                 check=~Q(user=F('author')), name='not_follow_yourself')
         ]
+        indexes = [
+            Index(fields=['author', 'user'], name='subscribe_author_idx')
+        ]
 
     def __str__(self) -> str:
         return f'{self.user} follows {self.author}'
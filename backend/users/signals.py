@@ -0,0 +1,22 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CustomUser, Subscribe
+
+
+@receiver(post_save, sender=Subscribe)
+def increase_followers_count(sender, instance, created, **kwargs):
+    if created:
+        CustomUser.objects.filter(id=instance.author_id).update(
+            followers_count=F('followers_count') + 1
+        )
+        CustomUser.touch_interactions([instance.user_id])
+
+
+@receiver(post_delete, sender=Subscribe)
+def decrease_followers_count(sender, instance, **kwargs):
+    CustomUser.objects.filter(
+        id=instance.author_id, followers_count__gt=0
+    ).update(followers_count=F('followers_count') - 1)
+    CustomUser.touch_interactions([instance.user_id])